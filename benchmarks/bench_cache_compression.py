@@ -0,0 +1,74 @@
+"""
+Сравнение хранения ответов в кеше запросов без сжатия и со сжатием.
+
+Для каждого способа кеш заполняется страницами из
+`tests/fixture_data/site`, после чего замеряется размер базы SQLite
+и время повторного («тёплого») прохода по тем же ссылкам.
+
+Запуск: python benchmarks/bench_cache_compression.py [--pages N]
+"""
+import argparse
+import sqlite3
+import tempfile
+import time
+from argparse import Namespace
+from pathlib import Path
+
+from site_server import FIXTURE_SITE_DIR, serve_directory
+
+import http_cache
+
+PAGES = (
+    'peps/', 'peps/pep-0001/', 'peps/pep-0484/', 'peps/pep-3000/',
+    'docs/3/', 'docs/3/whatsnew/', 'docs/3/whatsnew/3.12.html',
+    'docs/3/download.html',
+)
+
+
+def measure(base_url, compression, cache_dir, pages):
+    http_cache.CACHE_NAME = str(cache_dir / f'cache-{compression}')
+    http_cache.CACHE_STATS_PATH = cache_dir / 'cache_stats.sqlite3'
+    session = http_cache.create_session(
+        Namespace(cache_backend='sqlite', cache_compression=compression)
+    )
+    urls = [
+        f'{base_url}{PAGES[number % len(PAGES)]}?copy={number}'
+        for number in range(pages)
+    ]
+    for url in urls:
+        session.get(url)
+    started = time.perf_counter()
+    for url in urls:
+        assert session.get(url).from_cache
+    warm_time = time.perf_counter() - started
+    # В режиме WAL записанные строки лежат в файле `-wal`, пока
+    # не перенесены в основной файл базы.
+    connection = sqlite3.connect(session.cache.db_path)
+    connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    connection.close()
+    db_size = Path(session.cache.db_path).stat().st_size
+    return db_size, warm_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--pages', type=int, default=500)
+    args = parser.parse_args()
+    with serve_directory(FIXTURE_SITE_DIR) as base_url, \
+            tempfile.TemporaryDirectory() as cache_dir:
+        print(
+            f'{"Сжатие":<8} {"Размер базы, КБ":>16} '
+            f'{"Тёплый проход, с":>17}'
+        )
+        for compression in (None, 'zlib', 'lzma'):
+            db_size, warm_time = measure(
+                base_url, compression, Path(cache_dir), args.pages
+            )
+            print(
+                f'{compression or "нет":<8} {db_size / 1024:>16.1f} '
+                f'{warm_time:>17.3f}'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+"""
+Замеры режимов парсера на записанном корпусе страниц.
+
+Корпус отдаётся локальным сервером (по умолчанию — записанный
+`record_corpus.py` корпус, а если его нет — `tests/fixture_data/site`).
+Каждый режим выполняется в отдельном процессе с пустым кешем; для него
+выводятся время работы, количество страниц в секунду, время разбора
+одной страницы и пиковый объём памяти процесса.
+С `--synthetic-peps N` список PEP заменяется синтетическим на N карточек.
+С `--parse-procs N` страницы разбираются в пуле процессов; время
+разбора в процессах пула в столбец «Разбор» не попадает.
+
+Запуск: python benchmarks/bench_modes.py [--corpus DIR]
+        [--synthetic-peps N] [--modes MODE ...] [--workers N]
+        [--parse-procs N]
+"""
+import argparse
+import os
+import resource
+import tempfile
+import threading
+import time
+from argparse import Namespace
+from concurrent.futures import ProcessPoolExecutor
+from functools import wraps
+from multiprocessing import get_context
+from pathlib import Path
+
+from record_corpus import CORPUS_DIR
+from site_server import FIXTURE_SITE_DIR, serve_directory
+from synthetic_site import generate_site
+
+BENCH_MODES = ('whats-new', 'latest-versions', 'pep')
+"""Режимы, которые замеряются по умолчанию."""
+
+PARSE_METHODS = (
+    'whats_new_links', 'whats_new_page', 'version_links', 'pep_index',
+    'pep_status',
+)
+"""Методы извлечения данных, время которых считается временем разбора."""
+
+
+class ParseTimer:
+    """Суммарное время и количество вызовов методов разбора страниц."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.seconds = 0.0
+        self.pages = 0
+
+    def wrap(self, method):
+        @wraps(method)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                with self.lock:
+                    self.seconds += elapsed
+                    self.pages += 1
+        return timed
+
+    def install(self, extractor_class):
+        for name in PARSE_METHODS:
+            setattr(
+                extractor_class, name,
+                self.wrap(getattr(extractor_class, name))
+            )
+
+
+def run_mode(base_url, mode, options):
+    """Выполняет режим в дочернем процессе и возвращает его замеры."""
+    import requests_cache
+
+    import extractors
+    import main
+    import stats
+    from transport import mount_transport
+
+    main.MAIN_DOC_URL = f'{base_url}docs/3/'
+    main.MAIN_DOC_PEP_URL = f'{base_url}peps/'
+    timer = ParseTimer()
+    timer.install(extractors.EXTRACTORS[options.parser])
+    cli_args = Namespace(mode=mode, **vars(options))
+    session = mount_transport(
+        requests_cache.CachedSession(backend='memory'), cli_args
+    )
+
+    def count_page(response, *args, **kwargs):
+        # Хуки новых ответов вызываются и `requests`, и `requests_cache`.
+        if not getattr(response, 'bench_counted', False):
+            response.bench_counted = True
+            stats.increment('bench_pages')
+
+    session.hooks['response'].append(count_page)
+    started = time.perf_counter()
+    rows = list(main.MODE_TO_ROWS[mode](session, cli_args))
+    wall_time = time.perf_counter() - started
+    return {
+        'rows': len(rows),
+        'pages': stats.get('bench_pages'),
+        'wall_time': wall_time,
+        'parse_time': timer.seconds / max(timer.pages, 1),
+        'peak_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def benchmark(site_dir, modes, options):
+    results = {}
+    # Дочерние процессы наследуют окружение: индикаторы tqdm не нужны.
+    os.environ['TQDM_DISABLE'] = '1'
+    with serve_directory(site_dir) as base_url:
+        for mode in modes:
+            with ProcessPoolExecutor(
+                max_workers=1, mp_context=get_context('spawn')
+            ) as executor:
+                results[mode] = executor.submit(
+                    run_mode, base_url, mode, options
+                ).result()
+    return results
+
+
+def print_report(results):
+    print(
+        f'{"Режим":<16} {"Время, с":>9} {"Страниц":>8} {"Стр./с":>8} '
+        f'{"Разбор, мс/стр.":>16} {"Пик RSS, МБ":>12}'
+    )
+    for mode, result in results.items():
+        print(
+            f'{mode:<16} {result["wall_time"]:>9.2f} {result["pages"]:>8} '
+            f'{result["pages"] / result["wall_time"]:>8.1f} '
+            f'{result["parse_time"] * 1000:>16.2f} '
+            f'{result["peak_rss"]:>12.1f}'
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        '--corpus', type=Path,
+        default=CORPUS_DIR if CORPUS_DIR.exists() else FIXTURE_SITE_DIR
+    )
+    parser.add_argument('--synthetic-peps', type=int, metavar='N')
+    parser.add_argument('--modes', nargs='+', default=BENCH_MODES,
+                        choices=BENCH_MODES)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--parser', default='lxml', choices=('lxml', 'bs4'))
+    parser.add_argument('--engine', default='threads',
+                        choices=('threads', 'async'))
+    parser.add_argument('--rate', type=float, default=0)
+    parser.add_argument('--parse-procs', type=int, default=0)
+    args = parser.parse_args()
+    options = Namespace(
+        workers=args.workers, parser=args.parser, engine=args.engine,
+        rate=args.rate, parse_procs=args.parse_procs,
+    )
+    with tempfile.TemporaryDirectory() as site_dir:
+        if args.synthetic_peps:
+            generate_site(site_dir, args.synthetic_peps, args.corpus)
+            print(f'Синтетический список PEP: {args.synthetic_peps} карточек')
+            corpus = Path(site_dir)
+        else:
+            corpus = args.corpus
+        print(f'Корпус страниц: {corpus}')
+        print_report(benchmark(corpus, args.modes, options))
+
+
+if __name__ == '__main__':
+    main()
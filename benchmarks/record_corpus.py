@@ -0,0 +1,66 @@
+"""
+Запись корпуса страниц docs.python.org и peps.python.org для замеров.
+
+Находит те же страницы, что и режим `prefetch`, загружает их и
+сохраняет в каталог в формате `tests/fixture_data/site`: страницы
+документации — в `docs/3/`, страницы PEP — в `peps/`. Записанный
+корпус отдаётся локальным сервером в `bench_modes.py`.
+
+Запуск: python benchmarks/record_corpus.py [--output DIR]
+"""
+import argparse
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import requests
+from site_server import BENCHMARKS_DIR
+
+import main as parser_main
+from transport import mount_transport
+from utils import fetch_all
+
+CORPUS_DIR = BENCHMARKS_DIR / 'corpus'
+"""Каталог записанного корпуса по умолчанию."""
+
+HOST_DIRS = {
+    'docs.python.org': 'docs',
+    'peps.python.org': 'peps',
+}
+"""Каталоги корпуса для страниц каждого хоста."""
+
+
+def corpus_path(url, corpus_dir):
+    """Путь к файлу страницы в корпусе: `/` в конце — `index.html`."""
+    parts = urlsplit(url)
+    path = parts.path.lstrip('/')
+    if not path or path.endswith('/'):
+        path += 'index.html'
+    return Path(corpus_dir) / HOST_DIRS[parts.netloc] / path
+
+
+def record(corpus_dir, workers):
+    session = mount_transport(requests.Session())
+    url_groups = parser_main.prefetch_urls(session)
+    urls = [url for group in url_groups.values() for url in group]
+    recorded = 0
+    for url, response in zip(urls, fetch_all(session, urls, workers)):
+        if response is None or not response.ok:
+            continue
+        path = corpus_path(url, corpus_dir)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(response.content)
+        recorded += 1
+    return recorded, len(urls)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--output', type=Path, default=CORPUS_DIR)
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+    recorded, total = record(args.output, args.workers)
+    print(f'Записано страниц: {recorded} из {total} в {args.output}')
+
+
+if __name__ == '__main__':
+    main()
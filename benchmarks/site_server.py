@@ -0,0 +1,45 @@
+"""Локальный HTTP-сервер для замеров производительности парсера."""
+import sys
+import threading
+from contextlib import contextmanager
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+BASE_DIR = BENCHMARKS_DIR.parent
+SRC_DIR = BASE_DIR / 'src'
+FIXTURE_SITE_DIR = BASE_DIR / 'tests' / 'fixture_data' / 'site'
+
+if str(SRC_DIR) not in sys.path:
+    sys.path.append(str(SRC_DIR))
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    """Отдаёт файлы без вывода логов, поддерживая постоянные соединения."""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+class BenchServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+@contextmanager
+def serve_directory(directory):
+    """Отдаёт файлы каталога по HTTP; возвращает базовую ссылку."""
+    server = BenchServer(
+        ('127.0.0.1', 0), partial(QuietHandler, directory=str(directory))
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f'http://127.0.0.1:{server.server_port}/'
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,151 @@
+"""
+Генератор синтетического сайта PEP для замеров масштабирования.
+
+Создаёт каталог в формате `tests/fixture_data/site`: страницы
+документации копируются из исходного корпуса, а список PEP, карточки
+и `api/peps.json` генерируются для заданного количества PEP.
+
+Запуск: python benchmarks/synthetic_site.py DIR [--peps N]
+"""
+import argparse
+import json
+import shutil
+from pathlib import Path
+
+from site_server import FIXTURE_SITE_DIR
+
+from constants import EXPECTED_STATUS
+
+PEP_TYPES = ('S', 'P', 'I')
+"""Буквы типа PEP в первом столбце списка."""
+
+INDEX_TEMPLATE = '''<!DOCTYPE html>
+<html lang="en">
+<head><meta charset="utf-8"><title>PEP 0 – Index of Python Enhancement \
+Proposals (PEPs)</title></head>
+<body>
+<article>
+<section id="pep-content">
+  <h1 class="page-title">Index of Python Enhancement Proposals (PEPs)</h1>
+  <section id="numerical">
+    <h2>Numerical Index</h2>
+    <table class="pep-zero-table docutils align-default">
+      <thead><tr class="row-odd"><th class="head"></th><th class="head">\
+<p>PEP</p></th><th class="head"><p>PEP Title</p></th><th class="head">\
+<p>Authors</p></th></tr></thead>
+      <tbody>
+{rows}
+      </tbody>
+    </table>
+  </section>
+</section>
+</article>
+</body>
+</html>
+'''
+
+ROW_TEMPLATE = (
+    '        <tr class="row-even"><td><p><abbr title="Synthetic">'
+    '{status_key}</abbr></p></td><td><p><a class="pep reference internal" '
+    'href="pep-{number:04d}/" title="PEP {number} – {title}">{number}</a>'
+    '</p></td><td><p><a class="pep reference internal" '
+    'href="pep-{number:04d}/">{title}</a></p></td><td><p>Guido van Rossum'
+    '</p></td></tr>'
+)
+
+CARD_TEMPLATE = '''<!DOCTYPE html>
+<html lang="en">
+<head><meta charset="utf-8"><title>PEP {number} – {title} | \
+peps.python.org</title></head>
+<body>
+<article>
+<section id="pep-content">
+  <h1 class="page-title">PEP {number} – {title}</h1>
+  <dl class="rfc2822 field-list simple">
+    <dt class="field-odd">Author<span class="colon">:</span></dt>
+    <dd class="field-odd">Guido van Rossum</dd>
+    <dt class="field-even">Status<span class="colon">:</span></dt>
+    <dd class="field-even"><abbr title="{status} PEP">{status}</abbr></dd>
+    <dt class="field-odd">Created<span class="colon">:</span></dt>
+    <dd class="field-odd">13-Jun-2000</dd>
+  </dl>
+  <section id="abstract">
+    <h2>Abstract</h2>
+{paragraphs}
+  </section>
+</section>
+</article>
+</body>
+</html>
+'''
+
+PARAGRAPH = (
+    '    <p>This PEP describes a synthetic proposal used to measure the '
+    'parser. It contains enough text to resemble a real PEP card, with '
+    '<a href="../pep-0001/">links</a> and <code>inline code</code>.</p>'
+)
+
+
+def synthetic_peps(count):
+    """Номер, ключ статуса в списке и статус в карточке для каждого PEP."""
+    status_letters = list(EXPECTED_STATUS)
+    for number in range(1, count + 1):
+        letter = status_letters[number % len(status_letters)]
+        status_key = PEP_TYPES[number % len(PEP_TYPES)] + letter
+        yield number, status_key, EXPECTED_STATUS[letter][0]
+
+
+def generate_site(directory, pep_count, source_dir=FIXTURE_SITE_DIR,
+                  paragraphs=20):
+    """
+    Создаёт синтетический сайт в `directory` и возвращает ожидаемые
+    количества PEP по статусам.
+    """
+    directory = Path(directory)
+    shutil.copytree(source_dir / 'docs', directory / 'docs')
+    peps_dir = directory / 'peps'
+    (peps_dir / 'api').mkdir(parents=True)
+    body = '\n'.join([PARAGRAPH] * paragraphs)
+    rows = []
+    api = {}
+    counts = {}
+    for number, status_key, status in synthetic_peps(pep_count):
+        title = f'Synthetic Proposal {number}'
+        rows.append(ROW_TEMPLATE.format(
+            number=number, status_key=status_key, title=title
+        ))
+        card_dir = peps_dir / f'pep-{number:04d}'
+        card_dir.mkdir()
+        (card_dir / 'index.html').write_text(
+            CARD_TEMPLATE.format(
+                number=number, title=title, status=status, paragraphs=body
+            ),
+            encoding='utf-8',
+        )
+        api[str(number)] = {
+            'number': number,
+            'title': title,
+            'status': status,
+            'url': f'https://peps.python.org/pep-{number:04d}/',
+        }
+        counts[status] = counts.get(status, 0) + 1
+    (peps_dir / 'index.html').write_text(
+        INDEX_TEMPLATE.format(rows='\n'.join(rows)), encoding='utf-8'
+    )
+    (peps_dir / 'api' / 'peps.json').write_text(
+        json.dumps(api), encoding='utf-8'
+    )
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('directory', type=Path)
+    parser.add_argument('--peps', type=int, default=10000)
+    args = parser.parse_args()
+    counts = generate_site(args.directory, args.peps)
+    print(f'Создано карточек PEP: {sum(counts.values())}')
+
+
+if __name__ == '__main__':
+    main()
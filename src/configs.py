@@ -1,8 +1,19 @@
 import argparse
 import logging
-from logging.handlers import RotatingFileHandler
+import os
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+from queue import SimpleQueue
 
-from constants import BASE_DIR
+from constants import (BASE_DIR, CACHE_BACKENDS, CACHE_COMPRESSIONS,
+                       DEFAULT_CACHE_BACKEND, DEFAULT_RATE_LIMIT,
+                       DEFAULT_DOWNLOAD_FORMATS, DEFAULT_ENGINE,
+                       DEFAULT_PARSE_PROCS, DEFAULT_PARSER, DEFAULT_PEP_SOURCE,
+                       DEFAULT_VERIFY_SAMPLE, DEFAULT_WORKERS,
+                       DOWNLOAD_FORMATS, FETCH_ENGINES, PARSER_BACKENDS,
+                       OUTPUT_FORMATS, PEP_SOURCES, READ_TIMEOUT,
+                       RETRIES)
+from http_cache import parse_expire_rule
 
 
 LOG_FORMAT = '"%(asctime)s - [%(levelname)s] - %(message)s"'
@@ -30,26 +41,181 @@ def configure_argument_parser(
         action='store_true',
         help='Очистка кеша'
     )
+    parser.add_argument(
+        '-i',
+        '--incremental',
+        action='store_true',
+        help='Перепроверка страниц в кеше условными запросами'
+    )
+    parser.add_argument(
+        '--offline',
+        action='store_true',
+        help='Брать страницы только из кеша и завершать работу '
+             'при отсутствии страницы в кеше'
+    )
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Замерить время этапов работы и сохранить отчёт в profiles/'
+    )
+    parser.add_argument(
+        '--cprofile',
+        type=Path,
+        metavar='ФАЙЛ',
+        help='Сохранить профиль cProfile основного потока в файл'
+    )
+    parser.add_argument(
+        '--metrics-dir',
+        type=Path,
+        metavar='КАТАЛОГ',
+        help='Сохранить метрики запуска в формате Prometheus в каталог '
+             'для textfile collector node_exporter'
+    )
+    parser.add_argument(
+        '--cache-backend',
+        choices=CACHE_BACKENDS,
+        default=DEFAULT_CACHE_BACKEND,
+        help='Хранилище кеша запросов'
+    )
+    parser.add_argument(
+        '--cache-compression',
+        choices=CACHE_COMPRESSIONS,
+        help='Сжатие ответов в кеше запросов'
+    )
+    parser.add_argument(
+        '--expire',
+        action='append',
+        type=parse_expire_rule,
+        metavar='ШАБЛОН=СЕКУНДЫ',
+        help='Срок хранения в кеше ответов на ссылки по шаблону'
+    )
+    parser.add_argument(
+        '--delete-expired',
+        action='store_true',
+        help='Режим cache: удалить устаревшие записи'
+    )
+    parser.add_argument(
+        '--vacuum',
+        action='store_true',
+        help='Режим cache: сжать базу кеша'
+    )
+    parser.add_argument(
+        '--max-cache-size',
+        type=int,
+        metavar='МБ',
+        help='Режим cache: вытеснить давно не использованные записи '
+             'до заданного размера'
+    )
     parser.add_argument(
         '-o',
         '--output',
-        choices=('pretty', 'file'),
+        nargs='+',
+        choices=OUTPUT_FORMATS,
         help='Дополнительные способы вывода данных'
     )
+    parser.add_argument(
+        '-w',
+        '--workers',
+        type=int,
+        default=DEFAULT_WORKERS,
+        help='Количество потоков для загрузки страниц'
+    )
+    parser.add_argument(
+        '--parse-procs',
+        type=int,
+        nargs='?',
+        const=os.cpu_count(),
+        default=DEFAULT_PARSE_PROCS,
+        metavar='N',
+        help='Количество процессов для разбора страниц (без N — по числу '
+             'ядер, 0 — разбор в потоках загрузки)'
+    )
+    parser.add_argument(
+        '--rate',
+        type=float,
+        default=DEFAULT_RATE_LIMIT,
+        help='Максимальное число запросов в секунду к одному хосту '
+             '(0 — без ограничения)'
+    )
+    parser.add_argument(
+        '--timeout',
+        type=float,
+        default=READ_TIMEOUT,
+        help='Время ожидания ответа сервера, секунд'
+    )
+    parser.add_argument(
+        '--retries',
+        type=int,
+        default=RETRIES,
+        help='Количество повторов запроса при временных ошибках'
+    )
+    parser.add_argument(
+        '--engine',
+        choices=FETCH_ENGINES,
+        default=DEFAULT_ENGINE,
+        help='Способ параллельной загрузки страниц'
+    )
+    parser.add_argument(
+        '--formats',
+        nargs='+',
+        choices=DOWNLOAD_FORMATS.keys(),
+        default=DEFAULT_DOWNLOAD_FORMATS,
+        help='Форматы документации для режима download'
+    )
+    parser.add_argument(
+        '--parser',
+        choices=PARSER_BACKENDS,
+        default=DEFAULT_PARSER,
+        help='Способ разбора HTML-страниц'
+    )
+    parser.add_argument(
+        '--parse-cache',
+        action='store_true',
+        help='Кеширование результатов разбора страниц'
+    )
+    parser.add_argument(
+        '--source',
+        choices=PEP_SOURCES,
+        default=DEFAULT_PEP_SOURCE,
+        help='Источник статусов для режима pep'
+    )
+    parser.add_argument(
+        '--verify-sample',
+        type=int,
+        default=DEFAULT_VERIFY_SAMPLE,
+        metavar='K',
+        help='Количество случайных карточек PEP для сверки с JSON-документом'
+    )
     return parser
 
 
 def configure_logging():
+    """
+    Настраивает журнал в файл `logs/parser.log` и в консоль.
+
+    Записи попадают в очередь, а в файл и консоль их пишет отдельный
+    поток `QueueListener`, поэтому потоки загрузки не ждут ввода-вывода
+    журнала. Возвращает запущенный `QueueListener`: его нужно остановить
+    в конце работы, чтобы записать оставшиеся в очереди записи.
+    """
     log_dir = BASE_DIR / 'logs'
     log_dir.mkdir(exist_ok=True)
     log_file = log_dir / 'parser.log'
     rotating_handler = RotatingFileHandler(
         log_file, maxBytes=10 ** 6, backupCount=5, encoding='utf-8',
     )
-    logging.basicConfig(
-        datefmt=DT_FORMAT,
-        format=LOG_FORMAT,
-        level=logging.INFO,
-        encoding='utf-8',
-        handlers=(rotating_handler, logging.StreamHandler())
+    formatter = logging.Formatter(LOG_FORMAT, DT_FORMAT)
+    handlers = (rotating_handler, logging.StreamHandler())
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    log_queue = SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    # Сообщение и трассировка собираются до постановки в очередь,
+    # дата и уровень добавляются уже при записи.
+    queue_handler.setFormatter(logging.Formatter('%(message)s'))
+    listener = QueueListener(
+        log_queue, *handlers, respect_handler_level=True
     )
+    listener.start()
+    logging.basicConfig(level=logging.INFO, handlers=(queue_handler,))
+    return listener
@@ -26,3 +26,161 @@ EXPECTED_STATUS = {
 
 PATTERN_NUMBER_OF_PEP = r'(?P<number_of_pep>^\d+$)'
 """Шаблон для поиска номера PEP."""
+
+DEFAULT_WORKERS = 8
+"""Количество потоков для загрузки страниц по умолчанию."""
+
+FETCH_ENGINES = ('threads', 'async')
+"""Доступные способы параллельной загрузки страниц."""
+
+DEFAULT_ENGINE = 'threads'
+"""Способ загрузки страниц по умолчанию."""
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+"""Размер блока при потоковой загрузке архивов, байт."""
+
+DOWNLOAD_FORMATS = {
+    'pdf-a4': r'.+pdf-a4\.zip$',
+    'pdf-letter': r'.+pdf-letter\.zip$',
+    'html': r'.+html\.zip$',
+    'text': r'.+text\.zip$',
+    'epub': r'.+\.epub$',
+}
+"""Шаблоны ссылок на архивы документации по форматам."""
+
+DEFAULT_DOWNLOAD_FORMATS = ('pdf-a4',)
+"""Форматы документации, загружаемые по умолчанию."""
+
+SEGMENTED_DOWNLOAD_MIN_SIZE = 16 * 1024 * 1024
+"""Минимальный размер архива для загрузки по частям, байт."""
+
+DOWNLOAD_SEGMENTS = 4
+"""Количество частей, на которые делится большой архив."""
+
+PARSER_BACKENDS = ('lxml', 'bs4')
+"""Доступные способы разбора HTML-страниц."""
+
+DEFAULT_PARSER = 'lxml'
+"""Способ разбора HTML-страниц по умолчанию."""
+
+DEFAULT_PARSE_PROCS = 0
+"""Количество процессов разбора страниц по умолчанию: разбор в потоке."""
+
+PARSE_BACKLOG_PER_PROC = 4
+"""Сколько загруженных страниц может ждать разбора на один процесс."""
+
+PEP_API_PATH = 'api/peps.json'
+"""Путь к JSON-документу со сведениями обо всех PEP."""
+
+PEP_SOURCES = ('html', 'api')
+"""Источники статусов PEP: карточки PEP или JSON-документ."""
+
+DEFAULT_PEP_SOURCE = 'html'
+"""Источник статусов PEP по умолчанию."""
+
+DEFAULT_VERIFY_SAMPLE = 0
+"""Количество карточек PEP для сверки с JSON-документом по умолчанию."""
+
+PARSE_CACHE_PATH = BASE_DIR / 'parse_cache.sqlite3'
+"""Файл кеша результатов разбора страниц."""
+
+PARSE_CACHE_MAX_ENTRIES = 10000
+"""Максимальное количество записей в кеше результатов разбора."""
+
+CACHE_NAME = 'http_cache'
+"""Имя кеша запросов: файл базы SQLite или каталог для хранилища в файлах."""
+
+CACHE_BACKENDS = ('sqlite', 'filesystem', 'memory')
+"""Доступные хранилища кеша запросов."""
+
+DEFAULT_CACHE_BACKEND = 'sqlite'
+"""Хранилище кеша запросов по умолчанию."""
+
+CACHE_SQLITE_OPTIONS = {
+    'wal': True,
+    'timeout': 30,
+}
+"""
+Параметры базы SQLite кеша запросов.
+
+Журнал WAL позволяет читать кеш параллельно с записью, а `timeout`
+задаёт время ожидания блокировки в секундах вместо ошибки
+`database is locked`.
+"""
+
+CACHE_COMPRESSIONS = ('zlib', 'lzma')
+"""Доступные способы сжатия ответов в кеше запросов."""
+
+CACHE_URLS_EXPIRE_AFTER = {
+    'peps.python.org/api/': 60 * 60,
+    'peps.python.org/pep-': 7 * 24 * 60 * 60,
+    'peps.python.org/': 60 * 60,
+    'docs.python.org/3/whatsnew/3.': 7 * 24 * 60 * 60,
+    'docs.python.org/3/': 60 * 60,
+}
+"""
+Сроки хранения ответов в кеше по шаблонам ссылок, секунд.
+
+Применяется первый подходящий шаблон; ответы на прочие ссылки
+хранятся бессрочно.
+"""
+
+CACHE_STATS_PATH = BASE_DIR / 'cache_stats.sqlite3'
+"""Файл с учётом обращений к кешу запросов."""
+
+CONNECT_TIMEOUT = 5
+"""Время ожидания соединения с сервером, секунд."""
+
+READ_TIMEOUT = 30
+"""Время ожидания ответа сервера по умолчанию, секунд."""
+
+RETRIES = 3
+"""Количество повторов запроса по умолчанию."""
+
+BACKOFF_FACTOR = 0.5
+"""Начальная пауза перед повтором запроса, секунд."""
+
+MAX_BACKOFF = 30
+"""Максимальная пауза перед повтором запроса, секунд."""
+
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+"""Статусы ответа, при которых запрос повторяется."""
+
+IDEMPOTENT_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+"""Методы, запросы которых можно безопасно повторять."""
+
+POOL_CONNECTIONS = 10
+"""Количество пулов соединений и минимальный размер каждого пула."""
+
+DEFAULT_RATE_LIMIT = 20.0
+"""Максимальное число запросов в секунду к одному хосту по умолчанию."""
+
+INITIAL_CONCURRENCY = 2
+"""Начальный лимит одновременных запросов к одному хосту."""
+
+CONCURRENCY_DECREASE = 0.5
+"""Множитель лимита одновременных запросов при перегрузке хоста."""
+
+LATENCY_TOLERANCE = 2.0
+"""Допустимое отношение задержки ответа к лучшей, при котором лимит растёт."""
+
+THROTTLE_STATUSES = frozenset((429, 503))
+"""Статусы ответа, по которым хост считается перегруженным."""
+
+PRETTY_COLUMN_WIDTH = 20
+"""Минимальная ширина столбца таблицы при потоковом выводе."""
+
+OUTPUT_FORMATS = ('pretty', 'file', 'jsonl', 'sqlite')
+"""Дополнительные способы вывода данных."""
+
+RESULTS_HISTORY_NAME = 'history.sqlite3'
+"""Имя базы истории результатов в директории `results`."""
+
+PROFILE_PERCENTILES = (50, 90, 99)
+"""Процентили времени этапов в отчёте `--profile`."""
+
+PROFILE_SLOWEST_URLS = 10
+"""Количество самых медленных ссылок в отчёте `--profile`."""
+
+METRICS_PREFIX = 'bs4_parser'
+"""Префикс имён метрик Prometheus."""
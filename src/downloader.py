@@ -0,0 +1,220 @@
+import hashlib
+import json
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from constants import (DOWNLOAD_CHUNK_SIZE, DOWNLOAD_SEGMENTS,
+                       SEGMENTED_DOWNLOAD_MIN_SIZE)
+from transport import send
+
+NO_CACHE_HEADERS = {'Cache-Control': 'no-store'}
+"""Заголовки, при которых `requests_cache` не читает и не пишет кеш."""
+
+
+def _meta_path(path):
+    return path.with_name(path.name + '.meta.json')
+
+
+def _part_path(path):
+    return path.with_name(path.name + '.part')
+
+
+def _segments_path(path):
+    return path.with_name(path.name + '.segments')
+
+
+def _read_meta(path):
+    try:
+        return json.loads(_meta_path(path).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+
+
+def _file_hash(path):
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(DOWNLOAD_CHUNK_SIZE), b''):
+            hasher.update(chunk)
+    return hasher
+
+
+def get_remote_info(session, url):
+    """Возвращает размер, ETag и поддержку Range для файла на сервере."""
+    response = send(
+        session, 'HEAD', url, headers=NO_CACHE_HEADERS, allow_redirects=True
+    )
+    response.raise_for_status()
+    size = response.headers.get('Content-Length')
+    return {
+        'size': int(size) if size is not None else None,
+        'etag': response.headers.get('ETag'),
+        'ranges': response.headers.get('Accept-Ranges') == 'bytes',
+    }
+
+
+def is_up_to_date(path, remote):
+    """
+    Проверяет, совпадает ли скачанный файл с файлом на сервере.
+
+    Сравниваются размер и, если сервер его отдаёт, ETag.
+    """
+    if not path.exists() or remote['size'] is None:
+        return False
+    if path.stat().st_size != remote['size']:
+        return False
+    return remote['etag'] is None or (
+        _read_meta(path).get('etag') == remote['etag']
+    )
+
+
+def save_meta(path, url, remote, sha256):
+    _meta_path(path).write_text(
+        json.dumps({
+            'url': url,
+            'size': path.stat().st_size,
+            'etag': remote['etag'],
+            'sha256': sha256,
+        }),
+        encoding='utf-8',
+    )
+
+
+def _download_stream(session, url, path, offset, remote):
+    headers = dict(NO_CACHE_HEADERS)
+    if offset:
+        headers['Range'] = f'bytes={offset}-'
+        if remote['etag']:
+            headers['If-Range'] = remote['etag']
+    with send(session, 'GET', url, headers=headers, stream=True) as response:
+        response.raise_for_status()
+        if offset and response.status_code == 206:
+            logging.info(f'Продолжение загрузки {url} с {offset} байта')
+            hasher = _file_hash(path)
+            file_mode = 'ab'
+        else:
+            hasher = hashlib.sha256()
+            file_mode = 'wb'
+        with open(path, file_mode) as file:
+            for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                file.write(chunk)
+                hasher.update(chunk)
+    return hasher
+
+
+def _check_segment(response, url, start, end, size):
+    content_range = re.fullmatch(
+        r'bytes (\d+)-(\d+)/(\d+|\*)',
+        response.headers.get('Content-Range', '')
+    )
+    if response.status_code != 206 or content_range is None:
+        raise ValueError(
+            f'Сервер не вернул часть файла {url}: файл мог измениться'
+        )
+    if (
+        (int(content_range[1]), int(content_range[2])) != (start, end)
+        or content_range[3] not in ('*', str(size))
+    ):
+        raise ValueError(
+            f'Сервер вернул другую часть файла {url}: '
+            f'{content_range[0]} вместо bytes {start}-{end}/{size}'
+        )
+
+
+def _download_segment(session, url, path, start, end, size, etag=None):
+    headers = dict(NO_CACHE_HEADERS, Range=f'bytes={start}-{end}')
+    if etag:
+        headers['If-Range'] = etag
+    received = 0
+    with send(session, 'GET', url, headers=headers, stream=True) as response:
+        response.raise_for_status()
+        _check_segment(response, url, start, end, size)
+        with open(path, 'r+b') as file:
+            file.seek(start)
+            for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                received += len(chunk)
+                if received > end - start + 1:
+                    break
+                file.write(chunk)
+    if received != end - start + 1:
+        raise ValueError(
+            f'Часть файла {url} bytes {start}-{end} получена не полностью: '
+            f'{received} из {end - start + 1} байт'
+        )
+
+
+def download_segments(session, url, path, size, segments=DOWNLOAD_SEGMENTS,
+                      etag=None):
+    """
+    Скачивает файл параллельно несколькими диапазонами байт.
+
+    Каждая часть пишется на своё место в заранее выделенном файле.
+    Части запрашиваются с `If-Range`, а ответ сверяется по
+    `Content-Range` и числу полученных байт, поэтому файл, изменившийся
+    на сервере во время загрузки, не склеивается из разных версий.
+    При ошибке недокачанный файл удаляется.
+    """
+    segment_size = -(-size // segments)
+    bounds = [
+        (start, min(start + segment_size, size) - 1)
+        for start in range(0, size, segment_size)
+    ]
+    with open(path, 'wb') as file:
+        file.truncate(size)
+    try:
+        with ThreadPoolExecutor(max_workers=len(bounds)) as executor:
+            futures = [
+                executor.submit(
+                    _download_segment, session, url, path, start, end, size,
+                    etag,
+                )
+                for start, end in bounds
+            ]
+            for future in futures:
+                future.result()
+    except Exception:
+        path.unlink()
+        raise
+    return _file_hash(path)
+
+
+def download_file(session, url, path, segments=DOWNLOAD_SEGMENTS):
+    """
+    Скачивает файл потоком в обход кеша сессии.
+
+    Данные пишутся во временный файл `<имя>.part`; если он остался
+    от прерванной загрузки, скачивание продолжается запросом с Range.
+    Большие файлы при поддержке Range сервером скачиваются
+    параллельно `segments` частями.
+    Если файл уже скачан и совпадает с файлом на сервере,
+    загрузка пропускается.
+
+    :return: SHA-256 скачанного файла.
+    """
+    remote = get_remote_info(session, url)
+    if is_up_to_date(path, remote):
+        logging.info(f'Файл уже загружен и не изменился: {path}')
+        return _read_meta(path).get('sha256') or _file_hash(path).hexdigest()
+
+    part_path = _part_path(path)
+    offset = part_path.stat().st_size if part_path.exists() else 0
+    if remote['size'] is not None and offset > remote['size']:
+        offset = 0
+
+    if (
+        not offset and segments > 1 and remote['ranges']
+        and (remote['size'] or 0) >= SEGMENTED_DOWNLOAD_MIN_SIZE
+    ):
+        part_path = _segments_path(path)
+        hasher = download_segments(
+            session, url, part_path, remote['size'], segments, remote['etag']
+        )
+    elif offset and offset == remote['size']:
+        hasher = _file_hash(part_path)
+    else:
+        hasher = _download_stream(session, url, part_path, offset, remote)
+
+    part_path.replace(path)
+    sha256 = hasher.hexdigest()
+    save_meta(path, url, remote, sha256)
+    return sha256
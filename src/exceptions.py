@@ -4,3 +4,11 @@ class ParserFindTagException(Exception):
 
 class ListOfPythonVersionException(Exception):
     """Вызывается, когда не найден список c версиями Python."""
+
+
+class CacheMissException(Exception):
+    """Вызывается, когда в автономном режиме страницы нет в кеше."""
+
+
+class ModeFailedException(Exception):
+    """Вызывается, когда в режиме `all` один из режимов завершился ошибкой."""
@@ -0,0 +1,425 @@
+import hashlib
+import inspect
+import logging
+import re
+import sys
+import threading
+from collections import deque, namedtuple
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import get_context
+from urllib.parse import urljoin
+
+from lxml import etree, html
+
+import profiling
+import stats
+import utils
+from constants import (DEFAULT_PARSE_PROCS, DEFAULT_PARSER,
+                       PARSE_BACKLOG_PER_PROC, PARSE_CACHE_PATH,
+                       PATTERN_NUMBER_OF_PEP)
+from exceptions import ListOfPythonVersionException, ParserFindTagException
+from parse_cache import ParseCache
+from utils import find_tag, make_soup
+
+PEP_FIELD_CLASSES = ['field-even', 'field-odd']
+ASCII_SPACES = '\x20\x0a\x09\x0c\x0d'
+
+
+def _collapse_whitespace(string):
+    if string.strip(ASCII_SPACES):
+        return string
+    return '\n' if '\n' in string else ' '
+
+
+def _text(node):
+    """
+    Возвращает текст узла lxml так же, как `Tag.text` в BeautifulSoup.
+
+    BeautifulSoup заменяет строки из одних пробелов на один перевод
+    строки или пробел, поэтому здесь делается то же самое.
+    """
+    return ''.join(map(_collapse_whitespace, node.itertext()))
+
+
+def _has_class(name):
+    return f'contains(concat(" ", normalize-space(@class), " "), " {name} ")'
+
+
+_process_extractors = {}
+
+
+def extract_content(extractor_class, method, content, encoding):
+    """
+    Разбирает тело страницы в процессе пула разбора.
+
+    Страница декодируется здесь же, поэтому в процесс передаются
+    только байты тела, а обратно — результат разбора.
+    """
+    extractor = _process_extractors.get(extractor_class)
+    if extractor is None:
+        extractor = _process_extractors[extractor_class] = extractor_class()
+    return getattr(extractor, method)(
+        str(content, encoding, errors='replace')
+    )
+
+
+def _done(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+class Extractor:
+    """
+    Общая часть способов извлечения данных.
+
+    Если задан `parse_cache`, результаты разбора отдельных страниц
+    берутся из него, пока не изменятся тело страницы или код извлечения.
+    Если задан `parse_procs`, страницы в `extract_pages` разбираются
+    в пуле из стольких процессов.
+    """
+
+    parse_cache = None
+    parse_procs = 0
+
+    def extract_page(self, method, response):
+        extract = getattr(self, method)
+        if self.parse_cache is None:
+            stats.increment('pages_parsed')
+            return extract(response.text)
+        body_hash = hashlib.sha256(response.content).hexdigest()
+        result = self.parse_cache.get(method, response.url, body_hash)
+        if result is None:
+            stats.increment('pages_parsed')
+            result = extract(response.text)
+            self.parse_cache.set(method, response.url, body_hash, result)
+        return result
+
+    def _submit(self, pool, method, response):
+        """Ставит страницу в очередь разбора, минуя кеш разбора."""
+        if response is None:
+            return _done(None), None
+        cache_key = None
+        if self.parse_cache is not None:
+            cache_key = (
+                method, response.url,
+                hashlib.sha256(response.content).hexdigest(),
+            )
+            result = self.parse_cache.get(*cache_key)
+            if result is not None:
+                return _done(result), None
+        stats.increment('pages_parsed')
+        future = pool.submit(
+            extract_content, type(self), method, response.content,
+            response.encoding or response.apparent_encoding,
+        )
+        return future, cache_key
+
+    def _result(self, future, cache_key):
+        result = future.result()
+        if cache_key is not None:
+            self.parse_cache.set(*cache_key, result)
+        return result
+
+    def extract_pages(self, method, responses):
+        """
+        Разбирает страницы по мере загрузки, сохраняя их порядок.
+
+        Для отсутствующих ответов возвращается None. Без пула разбора
+        страницы разбираются в текущем потоке. С пулом загрузка
+        продолжается, пока процессы разбирают уже загруженные страницы;
+        очередь разбора ограничена `PARSE_BACKLOG_PER_PROC` страницами
+        на процесс, чтобы не держать в памяти все загруженные тела.
+        """
+        if not self.parse_procs:
+            for response in responses:
+                yield (
+                    None if response is None
+                    else self.extract_page(method, response)
+                )
+            return
+        backlog = self.parse_procs * PARSE_BACKLOG_PER_PROC
+        pending = deque()
+        with ProcessPoolExecutor(
+            self.parse_procs, mp_context=get_context('spawn')
+        ) as pool:
+            for response in responses:
+                pending.append(self._submit(pool, method, response))
+                if len(pending) >= backlog:
+                    yield self._result(*pending.popleft())
+            while pending:
+                yield self._result(*pending.popleft())
+
+
+class BeautifulSoupExtractor(Extractor):
+    """Извлечение данных со страниц через BeautifulSoup."""
+
+    def whats_new_links(self, text, base_url):
+        soup = make_soup(text)
+        main_div = find_tag(
+            soup, 'section', attrs={'id': 'what-s-new-in-python'}
+        )
+        div_with_ul = find_tag(
+            main_div, 'div', attrs={'class': 'toctree-wrapper'}
+        )
+        return [
+            urljoin(base_url, section.find('a')['href'])
+            for section in div_with_ul.find_all(
+                'li', attrs={'class': 'toctree-l1'}
+            )
+        ]
+
+    def whats_new_page(self, text):
+        soup = make_soup(text, 'whats-new')
+        h1 = find_tag(soup, 'h1')
+        dl = find_tag(soup, 'dl')
+        return h1.text, dl.text.replace('\n', ' ')
+
+    def version_links(self, text):
+        soup = make_soup(text)
+        sidebar = find_tag(
+            soup, 'div', attrs={'class': 'sphinxsidebarwrapper'}
+        )
+        for ul in sidebar.find_all('ul'):
+            if 'All versions' in ul.text:
+                return [(a_tag['href'], a_tag.text) for a_tag in ul('a')]
+        raise ListOfPythonVersionException(
+            'Не найден список c версиями Python')
+
+    def archive_link(self, text, pattern):
+        soup = make_soup(text)
+        main_tag = find_tag(soup, 'div', attrs={'role': 'main'})
+        table_tag = find_tag(main_tag, 'table', {'class': 'docutils'})
+        return find_tag(
+            table_tag, 'a', attrs={'href': re.compile(pattern)}
+        )['href']
+
+    def pep_index(self, text):
+        soup = make_soup(text)
+        for row in soup.find_all('tr'):
+            cells = row.find_all('td', recursive=False)
+            for status_cell, cell in zip(cells, cells[1:]):
+                if re.search(PATTERN_NUMBER_OF_PEP, cell.text):
+                    yield (
+                        cell.text,
+                        cell.find('a')['href'],
+                        status_cell.text.strip(),
+                    )
+                    break
+
+    def pep_status(self, text):
+        soup = make_soup(text, 'pep')
+        find_tag_dt = find_tag(
+            soup, 'dt', attrs={'class': PEP_FIELD_CLASSES}
+        )
+        while find_tag_dt and find_tag_dt.text != 'Status:':
+            find_tag_dt = find_tag_dt.find_next_sibling(
+                'dt', {'class': PEP_FIELD_CLASSES}
+            )
+        if find_tag_dt is None:
+            raise ParserFindTagException('Не найден тег dt Status:')
+        return find_tag_dt.find_next_sibling('dd').text
+
+
+class LxmlExtractor(Extractor):
+    """Извлечение данных со страниц через lxml и XPath-запросы."""
+
+    WHATS_NEW_SECTION = etree.XPath('//section[@id="what-s-new-in-python"]')
+    TOCTREE_WRAPPER = etree.XPath(f'.//div[{_has_class("toctree-wrapper")}]')
+    TOCTREE_LINKS = etree.XPath(
+        f'.//li[{_has_class("toctree-l1")}]/descendant::a[1]/@href'
+    )
+    FIRST_H1 = etree.XPath('(//h1)[1]')
+    FIRST_DL = etree.XPath('(//dl)[1]')
+    SIDEBAR = etree.XPath(f'//div[{_has_class("sphinxsidebarwrapper")}]')
+    SIDEBAR_LISTS = etree.XPath('.//ul')
+    LINKS = etree.XPath('.//a')
+    MAIN_DIV = etree.XPath('//div[@role="main"]')
+    DOCUTILS_TABLE = etree.XPath(f'.//table[{_has_class("docutils")}]')
+    TABLE_ROWS = etree.XPath('//tr')
+    ROW_CELLS = etree.XPath('./td')
+    FIRST_LINK_HREF = etree.XPath('(.//a)[1]/@href')
+    PEP_FIELDS = etree.XPath(
+        '//dt[{}]'.format(
+            ' or '.join(_has_class(name) for name in PEP_FIELD_CLASSES)
+        )
+    )
+    NEXT_DD = etree.XPath('following-sibling::dd[1]')
+
+    @staticmethod
+    def _first(xpath, node, tag, attrs=None):
+        with profiling.phase('find_tag'):
+            found = xpath(node)
+        if not found:
+            error_msg = f'Не найден тег {tag} {attrs}'
+            logging.error(error_msg, stack_info=True)
+            raise ParserFindTagException(error_msg)
+        return found[0]
+
+    @staticmethod
+    def _parse(text):
+        with profiling.phase('lxml_parse'):
+            return html.document_fromstring(text)
+
+    def whats_new_links(self, text, base_url):
+        tree = self._parse(text)
+        main_div = self._first(
+            self.WHATS_NEW_SECTION, tree,
+            'section', {'id': 'what-s-new-in-python'}
+        )
+        div_with_ul = self._first(
+            self.TOCTREE_WRAPPER, main_div,
+            'div', {'class': 'toctree-wrapper'}
+        )
+        return [
+            urljoin(base_url, href)
+            for href in self.TOCTREE_LINKS(div_with_ul)
+        ]
+
+    def whats_new_page(self, text):
+        tree = self._parse(text)
+        h1 = self._first(self.FIRST_H1, tree, 'h1')
+        dl = self._first(self.FIRST_DL, tree, 'dl')
+        return _text(h1), _text(dl).replace('\n', ' ')
+
+    def version_links(self, text):
+        tree = self._parse(text)
+        sidebar = self._first(
+            self.SIDEBAR, tree, 'div', {'class': 'sphinxsidebarwrapper'}
+        )
+        for ul in self.SIDEBAR_LISTS(sidebar):
+            if 'All versions' in _text(ul):
+                return [
+                    (a_tag.get('href'), _text(a_tag))
+                    for a_tag in self.LINKS(ul)
+                ]
+        raise ListOfPythonVersionException(
+            'Не найден список c версиями Python')
+
+    def archive_link(self, text, pattern):
+        tree = self._parse(text)
+        main_tag = self._first(self.MAIN_DIV, tree, 'div', {'role': 'main'})
+        table_tag = self._first(
+            self.DOCUTILS_TABLE, main_tag, 'table', {'class': 'docutils'}
+        )
+        archive_links = [
+            a_tag.get('href') for a_tag in self.LINKS(table_tag)
+            if re.search(pattern, a_tag.get('href', ''))
+        ]
+        return self._first(
+            lambda node: node, archive_links,
+            'a', {'href': re.compile(pattern)}
+        )
+
+    def pep_index(self, text):
+        tree = self._parse(text)
+        for row in self.TABLE_ROWS(tree):
+            cells = self.ROW_CELLS(row)
+            for status_cell, cell in zip(cells, cells[1:]):
+                number = _text(cell)
+                if re.search(PATTERN_NUMBER_OF_PEP, number):
+                    yield (
+                        number,
+                        self.FIRST_LINK_HREF(cell)[0],
+                        _text(status_cell).strip(),
+                    )
+                    break
+
+    def pep_status(self, text):
+        tree = self._parse(text)
+        for dt_tag in self.PEP_FIELDS(tree):
+            if _text(dt_tag) == 'Status:':
+                return _text(self.NEXT_DD(dt_tag)[0])
+        raise ParserFindTagException('Не найден тег dt Status:')
+
+
+PepIndexRecord = namedtuple(
+    'PepIndexRecord', ('number', 'url', 'status_key')
+)
+
+
+def build_pep_index(extractor, text, base_url):
+    """
+    Строит список уникальных PEP из таблиц главной страницы PEP.
+
+    Один и тот же PEP встречается в таблице своей категории
+    и в общем списке, поэтому учитывается только первое вхождение.
+    """
+    records = {}
+    for number, short_link, status_key in extractor.pep_index(text):
+        records.setdefault(
+            int(number),
+            PepIndexRecord(
+                int(number), urljoin(base_url, short_link), status_key
+            ),
+        )
+    return list(records.values())
+
+
+EXTRACTORS = {
+    'bs4': BeautifulSoupExtractor,
+    'lxml': LxmlExtractor,
+}
+"""Классы извлечения данных по названиям из `constants.PARSER_BACKENDS`."""
+
+
+def get_extractor(name):
+    return EXTRACTORS[name]()
+
+
+def extractor_version(name):
+    """
+    Версия кода извлечения: хеш исходного кода модулей разбора.
+
+    Меняется при любой правке извлечения, что сбрасывает кеш
+    результатов разбора.
+    """
+    source = inspect.getsource(sys.modules[__name__]) + inspect.getsource(
+        utils
+    )
+    return hashlib.sha256(f'{name}\n{source}'.encode()).hexdigest()
+
+
+_parse_caches = {}
+_parse_caches_lock = threading.Lock()
+
+
+def shared_parse_cache(name):
+    """
+    Кеш результатов разбора для способа извлечения `name`.
+
+    Все режимы запуска, в том числе выполняемые одновременно режимом
+    `all`, используют одно соединение с базой кеша.
+    """
+    key = (PARSE_CACHE_PATH, name, extractor_version(name))
+    with _parse_caches_lock:
+        if key not in _parse_caches:
+            _parse_caches[key] = ParseCache(*key)
+        return _parse_caches[key]
+
+
+def close_parse_caches():
+    """Записывает время обращений к кешам разбора и закрывает их."""
+    with _parse_caches_lock:
+        for parse_cache in _parse_caches.values():
+            parse_cache.close()
+        _parse_caches.clear()
+
+
+def extractor_for(cli_args=None):
+    """
+    Создаёт способ извлечения данных по аргументам командной строки.
+
+    Кеш результатов разбора включается `--parse-cache` и `--incremental`:
+    страницы, которые сервер подтвердил ответом 304, не разбираются
+    повторно.
+    """
+    name = getattr(cli_args, 'parser', DEFAULT_PARSER)
+    extractor = get_extractor(name)
+    extractor.parse_procs = getattr(
+        cli_args, 'parse_procs', DEFAULT_PARSE_PROCS
+    )
+    if (getattr(cli_args, 'parse_cache', False)
+            or getattr(cli_args, 'incremental', False)):
+        extractor.parse_cache = shared_parse_cache(name)
+    return extractor
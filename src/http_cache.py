@@ -0,0 +1,230 @@
+import logging
+import lzma
+import sqlite3
+import threading
+import time
+import zlib
+
+import requests_cache
+from requests_cache import CachedResponse
+from requests_cache.backends import FileCache, SQLiteCache
+from requests_cache.serializers import (SerializerPipeline, Stage,
+                                        pickle_serializer)
+
+import stats
+from constants import (CACHE_NAME, CACHE_SQLITE_OPTIONS, CACHE_STATS_PATH,
+                       CACHE_URLS_EXPIRE_AFTER, DEFAULT_CACHE_BACKEND)
+from exceptions import CacheMissException
+
+COMPRESSORS = {
+    'zlib': zlib,
+    'lzma': lzma,
+}
+
+
+def parse_expire_rule(rule):
+    """
+    Разбирает правило срока хранения вида `ШАБЛОН=СЕКУНДЫ`.
+
+    Используется как `type` для аргумента командной строки.
+    """
+    pattern, _, seconds = rule.rpartition('=')
+    if not pattern:
+        raise ValueError(f'Некорректное правило срока хранения: {rule}')
+    return pattern, int(seconds)
+
+
+def urls_expire_after(cli_args=None):
+    """Сроки хранения по шаблонам ссылок; правила из аргументов — первыми."""
+    rules = dict(getattr(cli_args, 'expire', None) or ())
+    for pattern, expire_after in CACHE_URLS_EXPIRE_AFTER.items():
+        rules.setdefault(pattern, expire_after)
+    return rules
+
+
+class CacheUsage:
+    """
+    Учёт обращений к кешу запросов между запусками парсера.
+
+    Время последнего обращения к каждой записи копится в памяти
+    и сохраняется в `CACHE_STATS_PATH` в конце запуска вместе
+    с количеством попаданий и промахов.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or CACHE_STATS_PATH
+        self._lock = threading.Lock()
+        self._accessed = {}
+
+    def __call__(self, response, *args, **kwargs):
+        cache_key = getattr(response, 'cache_key', None)
+        if cache_key:
+            with self._lock:
+                self._accessed[cache_key] = time.time()
+        return response
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path)
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS access '
+            '(key TEXT PRIMARY KEY, accessed REAL)'
+        )
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS runs '
+            '(run_at REAL, mode TEXT, hits INTEGER, misses INTEGER)'
+        )
+        return connection
+
+    def save(self, mode):
+        counters = stats.snapshot()
+        hits = (
+            counters.get('pages_cached', 0)
+            + counters.get('pages_unchanged', 0)
+        )
+        with self._lock:
+            accessed, self._accessed = self._accessed, {}
+        connection = self._connect()
+        with connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO access VALUES (?, ?)',
+                accessed.items()
+            )
+            connection.execute(
+                'INSERT INTO runs VALUES (?, ?, ?, ?)',
+                (time.time(), mode, hits, counters.get('pages_refetched', 0))
+            )
+        connection.close()
+
+    def totals(self):
+        connection = self._connect()
+        hits, misses = connection.execute(
+            'SELECT COALESCE(SUM(hits), 0), COALESCE(SUM(misses), 0) '
+            'FROM runs'
+        ).fetchone()
+        connection.close()
+        return hits, misses
+
+    def last_access(self):
+        connection = self._connect()
+        accessed = dict(connection.execute('SELECT key, accessed FROM access'))
+        connection.close()
+        return accessed
+
+    def forget(self, keys):
+        connection = self._connect()
+        with connection:
+            connection.executemany(
+                'DELETE FROM access WHERE key = ?', ((key,) for key in keys)
+            )
+        connection.close()
+
+
+def compressed_serializer(compression):
+    """Сериализатор кеша, сжимающий ответы модулем `zlib` или `lzma`."""
+    compressor = COMPRESSORS[compression]
+    return SerializerPipeline(
+        [
+            *pickle_serializer.stages,
+            Stage(compressor, dumps='compress', loads='decompress'),
+        ],
+        name=f'pickle-{compression}',
+        is_binary=True,
+    )
+
+
+def raise_on_cache_miss(response, *args, **kwargs):
+    """
+    Хук ответа для автономного режима: прерывает работу при промахе кеша.
+
+    `requests_cache` с `only_if_cached` вместо запроса к серверу
+    возвращает ответ 504 «Not Cached».
+    """
+    if isinstance(response, CachedResponse) and response.status_code == 504:
+        raise CacheMissException(f'Страницы нет в кеше: {response.url}')
+    return response
+
+
+def create_session(cli_args=None):
+    """
+    Создаёт сессию с кешем запросов по аргументам командной строки.
+
+    Сессию можно использовать из нескольких потоков: база SQLite
+    открывается в режиме WAL с ожиданием блокировок. В автономном
+    режиме ответы берутся только из кеша, в том числе устаревшие.
+    """
+    offline = getattr(cli_args, 'offline', False)
+    compression = getattr(cli_args, 'cache_compression', None)
+    backend = getattr(cli_args, 'cache_backend', DEFAULT_CACHE_BACKEND)
+    backend_options = CACHE_SQLITE_OPTIONS if backend == 'sqlite' else {}
+    session = requests_cache.CachedSession(
+        CACHE_NAME,
+        backend=backend,
+        serializer=compressed_serializer(compression) if compression else None,
+        urls_expire_after=urls_expire_after(cli_args),
+        always_revalidate=getattr(cli_args, 'incremental', False),
+        only_if_cached=offline,
+        stale_if_error=offline,
+        **backend_options,
+    )
+    session.cache_usage = CacheUsage()
+    session.hooks['response'].append(session.cache_usage)
+    if offline:
+        session.hooks['response'].append(raise_on_cache_miss)
+    return session
+
+
+def response_sizes(cache):
+    """Размер каждой записи кеша в байтах: {ключ: размер}."""
+    if isinstance(cache, SQLiteCache):
+        with cache.responses.connection() as connection:
+            return dict(connection.execute(
+                f'SELECT key, LENGTH(value) '
+                f'FROM {cache.responses.table_name}'
+            ))
+    if isinstance(cache, FileCache):
+        return {path.stem: path.stat().st_size for path in cache.paths()}
+    return {}
+
+
+def evict_to_size(cache, cache_usage, max_size):
+    """
+    Удаляет давно не использованные записи, пока кеш больше `max_size`.
+
+    :return: Количество удалённых записей.
+    """
+    sizes = response_sizes(cache)
+    total = sum(sizes.values())
+    if total <= max_size:
+        return 0
+    accessed = cache_usage.last_access()
+    evicted = []
+    for key in sorted(sizes, key=lambda key: accessed.get(key, 0)):
+        if total <= max_size:
+            break
+        total -= sizes[key]
+        evicted.append(key)
+    cache.delete(*evicted)
+    cache_usage.forget(evicted)
+    logging.info(f'Из кеша вытеснено записей: {len(evicted)}')
+    return len(evicted)
+
+
+def cache_report(session):
+    """Строки отчёта о состоянии кеша запросов."""
+    cache = session.cache
+    sizes = response_sizes(cache)
+    hits, misses = session.cache_usage.totals()
+    requests_total = hits + misses
+    expired = sum(1 for _ in cache.filter(valid=False, expired=True))
+    return [
+        ('Хранилище', type(cache).__name__),
+        ('Записей', len(cache.responses)),
+        ('Устаревших записей', expired),
+        ('Размер, байт', sum(sizes.values())),
+        ('Попаданий в кеш', hits),
+        ('Промахов', misses),
+        (
+            'Доля попаданий',
+            f'{hits / requests_total:.2%}' if requests_total else '-'
+        ),
+    ]
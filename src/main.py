@@ -1,145 +1,303 @@
+import cProfile
+import datetime as dt
 import logging
 import re
+import threading
+import time
+from argparse import Namespace
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from urllib.parse import urljoin
 from collections import defaultdict
 
-import requests_cache
-from bs4 import BeautifulSoup
+from requests_cache.backends import SQLiteCache
 from tqdm import tqdm
 
+import metrics
+import profiling
+import stats
 from configs import configure_argument_parser, configure_logging
-from constants import (BASE_DIR, EXPECTED_STATUS, MAIN_DOC_PEP_URL,
-                       MAIN_DOC_URL,
-                       PATTERN_NUMBER_OF_PEP)
+from constants import (BASE_DIR, DATETIME_FORMAT, DEFAULT_DOWNLOAD_FORMATS,
+                       DEFAULT_ENGINE, DEFAULT_WORKERS, DOWNLOAD_FORMATS,
+                       EXPECTED_STATUS, MAIN_DOC_PEP_URL, MAIN_DOC_URL,
+                       PEP_API_PATH)
+from downloader import download_file
+from exceptions import CacheMissException, ModeFailedException
+from extractors import build_pep_index, close_parse_caches, extractor_for
+from http_cache import cache_report, create_session, evict_to_size
 from outputs import control_output
-from utils import find_tag, get_response
-from exceptions import ListOfPythonVersionException
+from pep_sources import pep_statuses
+from transport import mount_transport
+from utils import fetch_all, get_response
 
 
-def whats_new(session):
+def whats_new_rows(session, cli_args=None):
+    workers = getattr(cli_args, 'workers', DEFAULT_WORKERS)
+    engine = getattr(cli_args, 'engine', DEFAULT_ENGINE)
+    extractor = extractor_for(cli_args)
     whats_new_url = urljoin(MAIN_DOC_URL, 'whatsnew/')
     response = get_response(session, whats_new_url)
     if response is None:
         return
-    soup = BeautifulSoup(response.text, features='lxml')
-    main_div = find_tag(soup, 'section', attrs={'id': 'what-s-new-in-python'})
-    div_with_ul = find_tag(main_div, 'div', attrs={'class': 'toctree-wrapper'})
-    sections_by_python = div_with_ul.find_all(
-        'li', attrs={'class': 'toctree-l1'}
-    )
+    version_links = extractor.whats_new_links(response.text, whats_new_url)
 
-    results = [('Ссылка на статью', 'Заголовок', 'Редактор, автор')]
-    for section in tqdm(sections_by_python):
-        version_a_tag = section.find('a')
-        version_link = urljoin(whats_new_url, version_a_tag['href'])
-        response = get_response(session, version_link)
-        if response is None:
+    yield ('Ссылка на статью', 'Заголовок', 'Редактор, автор')
+    pages = extractor.extract_pages(
+        'whats_new_page',
+        fetch_all(session, version_links, workers, engine),
+    )
+    for version_link, page in tqdm(
+        zip(version_links, pages), total=len(version_links)
+    ):
+        if page is None:
             continue
-        soup = BeautifulSoup(response.text, 'lxml')
-        h1 = find_tag(soup, 'h1')
-        dl = find_tag(soup, 'dl')
-        dl_text = dl.text.replace('\n', ' ')
-        results.append(
-            (version_link, h1.text, dl_text)
-        )
-    return results
+        h1_text, dl_text = page
+        yield (version_link, h1_text, dl_text)
+
 
+def whats_new(session, cli_args=None):
+    return list(whats_new_rows(session, cli_args)) or None
 
-def latest_versions(session):
+
+def latest_versions_rows(session, cli_args=None):
+    extractor = extractor_for(cli_args)
     response = get_response(session, MAIN_DOC_URL)
     if response is None:
         return
-    soup = BeautifulSoup(response.text, 'lxml')
-
-    sidebar = find_tag(soup, 'div', attrs={'class': 'sphinxsidebarwrapper'})
-    ul_tags = sidebar.find_all('ul')
-    for ul in ul_tags:
-        if 'All versions' in ul.text:
-            a_tags = ul.find_all('a')
-            break
-    else:
-        raise ListOfPythonVersionException(
-            'Не найден список c версиями Python')
-
-    results = [('Ссылка на документацию', 'Версия', 'Статус')]
+    version_links = extractor.version_links(response.text)
+
+    yield ('Ссылка на документацию', 'Версия', 'Статус')
     pattern = r'Python (?P<version>\d\.\d+) \((?P<status>.*)\)'
-    for a_tag in a_tags:
-        link = a_tag['href']
-        text_match = re.search(pattern, a_tag.text)
+    for link, link_text in version_links:
+        text_match = re.search(pattern, link_text)
         if text_match is not None:
             version, status = text_match.groups()
         else:
-            version, status = a_tag.text, ''
-        results.append(
-            (link, version, status)
-        )
-    return results
+            version, status = link_text, ''
+        yield (link, version, status)
 
 
-def download(session):
+def latest_versions(session, cli_args=None):
+    return list(latest_versions_rows(session, cli_args)) or None
+
+
+def download(session, cli_args=None):
+    formats = getattr(cli_args, 'formats', DEFAULT_DOWNLOAD_FORMATS)
+    extractor = extractor_for(cli_args)
     downloads_url = urljoin(MAIN_DOC_URL, 'download.html')
     response = get_response(session, downloads_url)
     if response is None:
         return
-    soup = BeautifulSoup(response.text, features='lxml')
-    main_tag = find_tag(soup, 'div', attrs={'role': 'main'})
-    table_tag = find_tag(main_tag, 'table', {'class': 'docutils'})
-    pdf_a4_tag = find_tag(
-        table_tag, 'a', attrs={'href': re.compile(r'.+pdf-a4\.zip$')}
-    )
+    archive_urls = [
+        urljoin(
+            downloads_url,
+            extractor.archive_link(
+                response.text, DOWNLOAD_FORMATS[archive_format]
+            )
+        )
+        for archive_format in formats
+    ]
 
-    pdf_a4_link = pdf_a4_tag['href']
-    archive_url = urljoin(downloads_url, pdf_a4_link)
-    filename = archive_url.split('/')[-1]
     downloads_dir = BASE_DIR / 'downloads'
     downloads_dir.mkdir(exist_ok=True)
-    archive_path = downloads_dir / filename
-    response = session.get(archive_url)
-    with open(archive_path, 'wb') as file:
-        file.write(response.content)
-    logging.info(f'Архив был загружен и сохранён: {archive_path}')
+    archive_paths = [
+        downloads_dir / archive_url.split('/')[-1]
+        for archive_url in archive_urls
+    ]
+    with ThreadPoolExecutor(max_workers=len(archive_urls)) as executor:
+        hashes = executor.map(
+            partial(download_file, session), archive_urls, archive_paths
+        )
+        for archive_path, sha256 in zip(archive_paths, hashes):
+            logging.info(
+                f'Архив был загружен и сохранён: {archive_path} '
+                f'(SHA-256: {sha256})'
+            )
 
 
-def pep(session):
+def mismatch_report(mismatches):
+    """
+    Отчёт о PEP с несовпадающими статусами одной записью журнала.
+
+    :param mismatches: Тройки (запись, статус в карточке, ожидаемые
+    статусы), отчёт упорядочен по номеру PEP.
+    """
+    lines = [f'Несовпадающие статусы: {len(mismatches)}']
+    for record, status_in_card, expected_status in sorted(
+        mismatches, key=lambda mismatch: mismatch[0].number
+    ):
+        lines.append(
+            f'PEP {record.number}: {record.url}\n'
+            f'    Статус в карточке: {status_in_card}, '
+            f'ожидаемые статусы: {", ".join(expected_status)}'
+        )
+    return '\n'.join(lines)
+
+
+def pep_rows(session, cli_args=None):
+    extractor = extractor_for(cli_args)
     dict_results = defaultdict(int)
-    results = [('Статус', 'Количество')]
     response = get_response(session, MAIN_DOC_PEP_URL)
     if response is None:
         return
-    soup = BeautifulSoup(response.text, 'lxml')
-    find_all_tags = soup.find_all('td')
-    for tag in tqdm(find_all_tags):
-        text_match = re.search(PATTERN_NUMBER_OF_PEP, tag.text)
-        if text_match:
-            short_link = tag.find('a')['href']
-            full_url = urljoin(MAIN_DOC_PEP_URL, short_link)
-            status_key = tag.find_previous_sibling('td').text.strip()
-            pep_response = get_response(session, full_url)
-            if pep_response is None:
-                continue
-            pep_soup = BeautifulSoup(pep_response.text, 'lxml')
-            find_tag_dt = find_tag(
-                pep_soup, 'dt', attrs={'class': ['field-even', 'field-odd']}
+    pep_index = build_pep_index(extractor, response.text, MAIN_DOC_PEP_URL)
+
+    api_url = urljoin(MAIN_DOC_PEP_URL, PEP_API_PATH)
+    mismatches = []
+    for record, status_in_card in pep_statuses(
+        session, pep_index, api_url, extractor, cli_args
+    ):
+        dict_results[status_in_card] += 1
+        expected_status = EXPECTED_STATUS[record.status_key[1:]]
+        if status_in_card not in expected_status:
+            stats.increment('pep_mismatches')
+            mismatches.append((record, status_in_card, expected_status))
+    if mismatches:
+        logging.info(mismatch_report(mismatches))
+    yield ('Статус', 'Количество')
+    yield from dict_results.items()
+    yield ('Total', sum(dict_results.values()))
+
+
+def pep(session, cli_args=None):
+    return list(pep_rows(session, cli_args)) or None
+
+
+def prefetch_urls(session, cli_args=None):
+    """
+    Ссылки на все страницы, которые нужны режимам парсера, по группам.
+
+    Главные страницы загружаются сразу: по ним находятся ссылки
+    на статьи «What's New» и карточки PEP.
+    """
+    workers = getattr(cli_args, 'workers', DEFAULT_WORKERS)
+    engine = getattr(cli_args, 'engine', DEFAULT_ENGINE)
+    extractor = extractor_for(cli_args)
+    whats_new_url = urljoin(MAIN_DOC_URL, 'whatsnew/')
+    main_urls = [
+        MAIN_DOC_URL,
+        whats_new_url,
+        urljoin(MAIN_DOC_URL, 'download.html'),
+        MAIN_DOC_PEP_URL,
+        urljoin(MAIN_DOC_PEP_URL, PEP_API_PATH),
+    ]
+    responses = dict(
+        zip(main_urls, fetch_all(session, main_urls, workers, engine))
+    )
+    url_groups = {'Главные страницы': main_urls}
+    if responses[whats_new_url] is not None:
+        url_groups["Статьи What's New"] = extractor.whats_new_links(
+            responses[whats_new_url].text, whats_new_url
+        )
+    if responses[MAIN_DOC_PEP_URL] is not None:
+        url_groups['Карточки PEP'] = [
+            record.url for record in build_pep_index(
+                extractor, responses[MAIN_DOC_PEP_URL].text, MAIN_DOC_PEP_URL
             )
-            while find_tag_dt and find_tag_dt.text != 'Status:':
-                find_tag_dt = find_tag_dt.find_next_sibling(
-                    'dt', {'class': ['field-even', 'field-odd']}
-                )
-            status_in_card = find_tag_dt.find_next_sibling('dd').text
-            dict_results[status_in_card] += 1
-            expected_status = EXPECTED_STATUS[status_key[1:]]
-            if status_in_card not in expected_status:
-                logging.info(
-                    f'Несовпадающие статусы:\n'
-                    f'{full_url}\n'
-                    f'Статус в карточке: {status_in_card}\n'
-                    f'Ожидаемые статусы: {expected_status}\n'
-                )
-    results.extend(dict_results.items())
-    results.append(('Total', sum(dict_results.values())))
+        ]
+    return url_groups
+
+
+def prefetch(session, cli_args=None):
+    workers = getattr(cli_args, 'workers', DEFAULT_WORKERS)
+    engine = getattr(cli_args, 'engine', DEFAULT_ENGINE)
+    url_groups = prefetch_urls(session, cli_args)
+    urls = [url for group in url_groups.values() for url in group]
+    for _ in tqdm(fetch_all(session, urls, workers, engine), total=len(urls)):
+        pass
+
+    results = [('Страницы', 'Ссылок', 'В кеше', 'Покрытие')]
+    for group, group_urls in url_groups.items():
+        cached = sum(session.cache.contains(url=url) for url in group_urls)
+        results.append((
+            group, len(group_urls), cached,
+            f'{cached / len(group_urls):.0%}' if group_urls else '—'
+        ))
     return results
 
 
+def cache(session, cli_args=None):
+    max_cache_size = getattr(cli_args, 'max_cache_size', None)
+    if getattr(cli_args, 'delete_expired', False):
+        session.cache.delete(expired=True)
+        logging.info('Устаревшие записи удалены из кеша')
+    if max_cache_size is not None:
+        evict_to_size(
+            session.cache, session.cache_usage, max_cache_size * 1024 ** 2
+        )
+    if getattr(cli_args, 'vacuum', False):
+        if isinstance(session.cache, SQLiteCache):
+            session.cache.responses.vacuum()
+            logging.info('База кеша сжата')
+        else:
+            logging.warning('Сжатие доступно только для хранилища sqlite')
+    results = [('Параметр', 'Значение')]
+    results.extend(cache_report(session))
+    return results
+
+
+OUTPUT_LOCK = threading.Lock()
+"""Не даёт выводу одновременно работающих режимов перемешиваться."""
+
+
+def mode_args(cli_args, mode):
+    """Копия аргументов командной строки для запуска другого режима."""
+    values = vars(cli_args) if cli_args is not None else {'output': None}
+    return Namespace(**{**values, 'mode': mode})
+
+
+def run_mode(session, cli_args):
+    mode_function = {
+        **MODE_TO_FUNCTION, **SERVICE_MODE_TO_FUNCTION, **MODE_TO_ROWS
+    }[cli_args.mode]
+    return mode_function(session, cli_args)
+
+
+def run_mode_to_outputs(session, cli_args):
+    """
+    Выполняет режим в составе `all` и выводит его результаты.
+
+    Результаты режима невелики, поэтому собираются в список и выводятся
+    целиком под `OUTPUT_LOCK`: так вывод разных режимов в консоль
+    не перемешивается, а файлы у каждого режима свои.
+    """
+    started = time.perf_counter()
+    results = MODE_TO_FUNCTION[cli_args.mode](session, cli_args)
+    if results is not None:
+        with OUTPUT_LOCK:
+            control_output(results, cli_args)
+    metrics.observe_duration(cli_args.mode, time.perf_counter() - started)
+
+
+def all_modes(session, cli_args=None):
+    modes = list(MODE_TO_FUNCTION)
+    if getattr(cli_args, 'offline', False):
+        # Архивы документации не кешируются, и `download` без сети
+        # не может завершиться успешно.
+        modes.remove('download')
+        logging.info('Автономный режим: режим download пропущен')
+    with ThreadPoolExecutor(max_workers=len(modes)) as executor:
+        futures = {
+            mode: executor.submit(
+                run_mode_to_outputs, session, mode_args(cli_args, mode)
+            )
+            for mode in modes
+        }
+    failed = []
+    for mode, future in futures.items():
+        try:
+            future.result()
+        except CacheMissException:
+            raise
+        except Exception:
+            logging.exception(f'Режим {mode} завершился с ошибкой')
+            failed.append(mode)
+    if failed:
+        raise ModeFailedException(
+            f'Режимы завершились с ошибкой: {", ".join(failed)}'
+        )
+
+
 MODE_TO_FUNCTION = {
     'whats-new': whats_new,
     'latest-versions': latest_versions,
@@ -147,26 +305,104 @@ MODE_TO_FUNCTION = {
     'pep': pep
 }
 
+MODE_TO_ROWS = {
+    'whats-new': whats_new_rows,
+    'latest-versions': latest_versions_rows,
+    'pep': pep_rows,
+}
+"""Режимы, строки результатов которых выводятся по мере получения."""
+
+SERVICE_MODE_TO_FUNCTION = {
+    'cache': cache,
+    'all': all_modes,
+    'prefetch': prefetch,
+}
 
-def main():
-    configure_logging()
+
+def profile_run(session, cli_args):
+    """
+    Выполняет режим и выводит результаты, замеряя время работы.
+
+    С `--profile` время этапов сохраняется в отчёт `profiles/`,
+    с `--cprofile` профиль основного потока сохраняется в файл.
+    """
+    profiler = cProfile.Profile() if cli_args.cprofile else None
+    if cli_args.profile:
+        profiling.enable()
+    started = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        results = run_mode(session, cli_args)
+        if results is not None:
+            control_output(results, cli_args)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(cli_args.cprofile)
+            logging.info(f'Профиль cProfile сохранён: {cli_args.cprofile}')
+    duration = time.perf_counter() - started
+    if cli_args.profile:
+        now_formatted = dt.datetime.now().strftime(DATETIME_FORMAT)
+        report_path = (
+            BASE_DIR / 'profiles' / f'{cli_args.mode}_{now_formatted}.json'
+        )
+        profiling.write_report(report_path, cli_args.mode, duration)
+        logging.info(f'Отчёт о времени работы сохранён: {report_path}')
+    return duration
+
+
+def run_parser():
     logging.info('Парсер запущен!')
 
-    arg_parser = configure_argument_parser(MODE_TO_FUNCTION.keys())
+    arg_parser = configure_argument_parser(
+        (*MODE_TO_FUNCTION, *SERVICE_MODE_TO_FUNCTION)
+    )
     args = arg_parser.parse_args()
     logging.info(f'Аргументы командной строки: {args}')
 
-    session = requests_cache.CachedSession()
+    session = mount_transport(create_session(args), args)
     if args.clear_cache:
         session.cache.clear()
 
     parser_mode = args.mode
-    results = MODE_TO_FUNCTION[parser_mode](session)
-
-    if results is not None:
-        control_output(results, args)
+    try:
+        metrics.observe_duration(parser_mode, profile_run(session, args))
+    except CacheMissException as error:
+        logging.error(f'Автономный режим: {error}')
+        raise SystemExit(1)
+    except ModeFailedException as error:
+        logging.error(error)
+        raise SystemExit(1)
+    if args.metrics_dir is not None:
+        metrics_path = metrics.write_textfile(args.metrics_dir, parser_mode)
+        logging.info(f'Метрики сохранены: {metrics_path}')
+    session.cache_usage.save(parser_mode)
+    if args.incremental:
+        logging.info(
+            f'Перепроверено страниц: {stats.get("pages_revalidated")}, '
+            f'без изменений: {stats.get("pages_unchanged")}, '
+            f'загружено заново: {stats.get("pages_refetched")}'
+        )
+    logging.info(
+        f'Повторов запросов: {stats.get("request_retries")}, '
+        f'неудачных запросов: {stats.get("request_failures")}'
+    )
+    for host, limit in session.transport.concurrency().items():
+        logging.info(
+            f'Одновременных запросов к {host}: {limit:.1f}'
+        )
     logging.info('Парсер завершил работу.')
 
 
+def main():
+    log_listener = configure_logging()
+    try:
+        run_parser()
+    finally:
+        close_parse_caches()
+        log_listener.stop()
+
+
 if __name__ == '__main__':
     main()
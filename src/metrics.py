@@ -0,0 +1,102 @@
+import os
+import threading
+import time
+
+import stats
+from constants import METRICS_PREFIX
+
+COUNTER_METRICS = (
+    ('requests', 'http_requests',
+     'Запросы к серверам, отправленные за запуск.'),
+    ('response_bytes', 'http_bytes',
+     'Байты тел ответов, полученные из сети за запуск (до распаковки).'),
+    ('request_retries', 'request_retries',
+     'Повторы запросов после временных ошибок за запуск.'),
+    ('request_failures', 'request_failures',
+     'Запросы, завершившиеся ошибкой после всех повторов, за запуск.'),
+    ('pages_parsed', 'pages_parsed',
+     'Страницы, разобранные за запуск.'),
+    ('pep_status_mismatches', 'pep_mismatches',
+     'PEP, статус в карточке которых не совпал с ожидаемым.'),
+)
+"""Метрики из счётчиков `stats`: имя метрики, счётчик и описание."""
+
+_lock = threading.Lock()
+_durations = {}
+
+
+def observe_duration(mode, seconds):
+    """Запоминает время работы режима для метрики длительности."""
+    with _lock:
+        _durations[mode] = seconds
+
+
+def reset():
+    with _lock:
+        _durations.clear()
+
+
+def _metric(name, help_text, samples):
+    """Строки метрики; `samples` — пары (словарь меток, значение)."""
+    full_name = f'{METRICS_PREFIX}_{name}'
+    lines = [f'# HELP {full_name} {help_text}', f'# TYPE {full_name} gauge']
+    for labels, value in samples:
+        label_text = ','.join(
+            f'{label}="{label_value}"' for label, label_value in labels.items()
+        )
+        lines.append(f'{full_name}{{{label_text}}} {value}')
+    return lines
+
+
+def render(mode):
+    """
+    Метрики запуска режима `mode` в текстовом формате Prometheus.
+
+    Время работы каждого режима помечено ещё и меткой `run` — режимом
+    запуска: режим `all` записывает время всех режимов, и без этой метки
+    его ряды совпали бы с рядами отдельных запусков в соседних файлах.
+    """
+    counters = stats.snapshot()
+    hits = counters.get('pages_cached', 0) + counters.get('pages_unchanged', 0)
+    lookups = hits + counters.get('pages_refetched', 0)
+    labels = {'mode': mode}
+    lines = []
+    for name, counter, help_text in COUNTER_METRICS:
+        lines += _metric(
+            name, help_text, [(labels, counters.get(counter, 0))]
+        )
+    lines += _metric(
+        'cache_hit_ratio',
+        'Доля страниц, полученных из кеша или подтверждённых ответом 304.',
+        [(labels, hits / lookups if lookups else 0)],
+    )
+    with _lock:
+        durations = sorted(_durations.items())
+    lines += _metric(
+        'run_duration_seconds', 'Время работы режима, секунд.',
+        [
+            ({'mode': run_mode, 'run': mode}, seconds)
+            for run_mode, seconds in durations
+        ],
+    )
+    lines += _metric(
+        'last_run_timestamp_seconds', 'Время завершения запуска.',
+        [(labels, round(time.time(), 3))],
+    )
+    return '\n'.join(lines) + '\n'
+
+
+def write_textfile(directory, mode):
+    """
+    Записывает метрики в `<directory>/bs4_parser_<mode>.prom`.
+
+    Файл заменяется атомарно, чтобы textfile collector node_exporter
+    не прочитал его наполовину записанным. У каждого режима свой файл,
+    поэтому запуски разных режимов из cron не затирают метрики друг друга.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f'{METRICS_PREFIX}_{mode}.prom'
+    temp_path = path.with_name(f'.{path.name}.{os.getpid()}')
+    temp_path.write_text(render(mode), encoding='utf-8')
+    os.replace(temp_path, path)
+    return path
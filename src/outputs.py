@@ -1,44 +1,302 @@
 import csv
 import datetime as dt
+import json
 import logging
+import sqlite3
+import textwrap
+from itertools import chain, zip_longest
 
 from prettytable import PrettyTable
 
-from constants import BASE_DIR, DATETIME_FORMAT
+import profiling
+from constants import (BASE_DIR, DATETIME_FORMAT, PRETTY_COLUMN_WIDTH,
+                       RESULTS_HISTORY_NAME)
+
+HISTORY_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS results (
+        mode TEXT NOT NULL,
+        run_at TEXT NOT NULL,
+        position INTEGER NOT NULL,
+        row TEXT NOT NULL,
+        PRIMARY KEY (mode, run_at, position)
+    ) WITHOUT ROWID
+'''
+"""
+Таблица истории результатов.
+
+Строка результата хранится JSON-объектом с ключами из заголовка,
+первичный ключ `(mode, run_at, position)` служит индексом для выборок
+по режиму и времени запуска.
+"""
+
+HISTORY_STATUS_INDEX = '''
+    CREATE INDEX IF NOT EXISTS results_status
+    ON results (mode, json_extract(row, '$.Статус'), run_at)
+'''
+"""
+Индекс для выборок динамики по статусу в режимах `pep`
+и `latest-versions`: условие запроса должно использовать то же
+выражение `json_extract(row, '$.Статус')`. Без статистики `ANALYZE`
+планировщик SQLite предпочитает первичный ключ, поэтому статистика
+обновляется после каждой записи запуска.
+"""
+
+HISTORY_ANALYSIS_LIMIT = 1000
+"""Сколько строк индекса просматривает `ANALYZE` базы истории."""
+
+
+def _results_dir():
+    results_dir = BASE_DIR / 'results'
+    results_dir.mkdir(exist_ok=True)
+    return results_dir
+
+
+def _result_path(cli_args, extension):
+    now_formatted = dt.datetime.now().strftime(DATETIME_FORMAT)
+    return _results_dir() / f'{cli_args.mode}_{now_formatted}.{extension}'
+
+
+class Sink:
+    """
+    Способ вывода, получающий строки результатов по одной.
+
+    Первой строкой приходит заголовок. `buffered` означает, что
+    результаты уже собраны в список целиком.
+    """
+
+    def __init__(self, cli_args=None, buffered=False):
+        self.cli_args = cli_args
+        self.buffered = buffered
+
+    def write(self, row):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def abort(self):
+        """Завершает вывод после ошибки в источнике строк."""
+        self.close()
+
+
+class ConsoleSink(Sink):
+
+    def write(self, row):
+        print(*row, flush=True)
+
+
+class PrettySink(Sink):
+    """
+    Таблица в консоли.
+
+    Собранные в список результаты выводятся через `PrettyTable`,
+    потоковые — по строкам: ширина столбцов задаётся заголовком
+    и не меньше `PRETTY_COLUMN_WIDTH`, значение длиннее столбца
+    переносится на следующие строки таблицы.
+    """
+
+    def __init__(self, cli_args=None, buffered=False):
+        super().__init__(cli_args, buffered)
+        self.rows = []
+        self.widths = None
+
+    def border(self):
+        return '+' + '+'.join(
+            '-' * (width + 2) for width in self.widths
+        ) + '+'
+
+    def lines(self, row):
+        columns = [
+            textwrap.wrap(str(cell), width) or ['']
+            for cell, width in zip(row, self.widths)
+        ]
+        return [
+            '| ' + ' | '.join(
+                part.ljust(width) for part, width in zip(parts, self.widths)
+            ) + ' |'
+            for parts in zip_longest(*columns, fillvalue='')
+        ]
+
+    def write(self, row):
+        if self.buffered:
+            self.rows.append(row)
+        elif self.widths is None:
+            self.widths = [
+                max(len(str(cell)), PRETTY_COLUMN_WIDTH) for cell in row
+            ]
+            print(
+                self.border(), *self.lines(row), self.border(),
+                sep='\n', flush=True
+            )
+        else:
+            print(*self.lines(row), sep='\n', flush=True)
+
+    def close(self):
+        if self.buffered and self.rows:
+            table = PrettyTable()
+            table.field_names = self.rows[0]
+            table.align = 'l'
+            table.add_rows(self.rows[1:])
+            print(table)
+        elif self.widths is not None:
+            print(self.border(), flush=True)
+
+
+class FileSink(Sink):
+    """Файл в `results/`, дописываемый после каждой строки."""
+
+    extension = None
+
+    def __init__(self, cli_args=None, buffered=False):
+        super().__init__(cli_args, buffered)
+        self.file_path = _result_path(cli_args, self.extension)
+        self.file = open(self.file_path, 'w', encoding='utf-8')
+
+    def close(self):
+        self.file.close()
+        logging.info(f'Файл с результатами был сохранён: {self.file_path}')
+
+
+class CsvSink(FileSink):
+    """CSV-файл в `results/`."""
+
+    extension = 'csv'
+
+    def __init__(self, cli_args=None, buffered=False):
+        super().__init__(cli_args, buffered)
+        self.writer = csv.writer(self.file, dialect='unix')
+
+    def write(self, row):
+        self.writer.writerow(row)
+        self.file.flush()
+
+
+class JsonlSink(FileSink):
+    """Файл JSON Lines: строка результата — объект с ключами заголовка."""
+
+    extension = 'jsonl'
+
+    def __init__(self, cli_args=None, buffered=False):
+        super().__init__(cli_args, buffered)
+        self.header = None
+
+    def write(self, row):
+        if self.header is None:
+            self.header = row
+            return
+        self.file.write(
+            json.dumps(dict(zip(self.header, row)), ensure_ascii=False)
+            + '\n'
+        )
+        self.file.flush()
+
+
+class SqliteSink(Sink):
+    """
+    База истории `results/history.sqlite3`.
+
+    Строки запуска собираются в памяти и при завершении вывода
+    записываются одним `executemany` в одной транзакции; при ошибке
+    в источнике строк в базу ничего не записывается.
+    """
+
+    def __init__(self, cli_args=None, buffered=False):
+        super().__init__(cli_args, buffered)
+        self.db_path = _results_dir() / RESULTS_HISTORY_NAME
+        self.run_at = dt.datetime.now().isoformat(sep=' ')
+        self.header = None
+        self.rows = []
+        self.connection = sqlite3.connect(self.db_path)
+        self.connection.execute(HISTORY_SCHEMA)
+        self.connection.execute(HISTORY_STATUS_INDEX)
+
+    def write(self, row):
+        if self.header is None:
+            self.header = row
+            return
+        self.rows.append((
+            self.cli_args.mode, self.run_at, len(self.rows),
+            json.dumps(dict(zip(self.header, row)), ensure_ascii=False),
+        ))
+
+    def close(self):
+        with self.connection:
+            self.connection.executemany(
+                'INSERT INTO results (mode, run_at, position, row) '
+                'VALUES (?, ?, ?, ?)', self.rows
+            )
+        self.connection.execute(
+            f'PRAGMA analysis_limit = {HISTORY_ANALYSIS_LIMIT}'
+        )
+        self.connection.execute('ANALYZE results')
+        self.connection.close()
+        logging.info(
+            f'Результаты запуска {self.run_at} сохранены в базу: '
+            f'{self.db_path}'
+        )
+
+    def abort(self):
+        self.connection.rollback()
+        self.connection.close()
+
+
+OUTPUT_SINKS = {
+    None: ConsoleSink,
+    'pretty': PrettySink,
+    'file': CsvSink,
+    'jsonl': JsonlSink,
+    'sqlite': SqliteSink,
+}
+
+
+def write_rows(results, sinks):
+    """Передаёт каждую строку результатов во все способы вывода."""
+    phases = [f'output:{type(sink).__name__}' for sink in sinks]
+    try:
+        for row in results:
+            for sink, name in zip(sinks, phases):
+                with profiling.phase(name):
+                    sink.write(row)
+    except BaseException:
+        for sink in sinks:
+            sink.abort()
+        raise
+    for sink, name in zip(sinks, phases):
+        with profiling.phase(name):
+            sink.close()
 
 
 def control_output(results, cli_args):
-    output = cli_args.output
-    if output == 'pretty':
-        pretty_output(results)
-    elif output == 'file':
-        file_output(results, cli_args)
-    else:
-        default_output(results)
+    """
+    Выводит результаты режима всеми выбранными способами за один проход.
+
+    `results` — список строк или итератор, выдающий строки по мере
+    получения; первой строкой идёт заголовок. `cli_args.output` — один
+    способ вывода или список способов. Если строк нет, ничего
+    не выводится.
+    """
+    rows = iter(results)
+    header = next(rows, None)
+    if header is None:
+        return
+    outputs = cli_args.output
+    if outputs is None or isinstance(outputs, str):
+        outputs = [outputs]
+    buffered = isinstance(results, list)
+    sinks = [
+        OUTPUT_SINKS[output](cli_args, buffered)
+        for output in dict.fromkeys(outputs)
+    ]
+    write_rows(chain([header], rows), sinks)
 
 
 def default_output(results):
-    for row in results:
-        print(*row)
+    write_rows(results, [ConsoleSink()])
 
 
 def pretty_output(results):
-    table = PrettyTable()
-    table.field_names = results[0]
-    table.align = 'l'
-    table.add_rows(results[1:])
-    print(table)
+    write_rows(results, [PrettySink(buffered=isinstance(results, list))])
 
 
 def file_output(results, cli_args):
-    results_dir = BASE_DIR / 'results'
-    results_dir.mkdir(exist_ok=True)
-    parser_mode = cli_args.mode
-    now = dt.datetime.now()
-    now_formatted = now.strftime(DATETIME_FORMAT)
-    file_name = f'{parser_mode}_{now_formatted}.csv'
-    file_path = results_dir / file_name
-    with open(file_path, 'w', encoding='utf-8') as f:
-        writer = csv.writer(f, dialect='unix')
-        writer.writerows(results)
-    logging.info(f'Файл с результатами был сохранён: {file_path}')
+    write_rows(results, [CsvSink(cli_args)])
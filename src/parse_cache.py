@@ -0,0 +1,104 @@
+import json
+import sqlite3
+import threading
+import time
+
+from constants import PARSE_CACHE_MAX_ENTRIES
+
+
+class ParseCache:
+    """
+    Постоянный кеш результатов разбора страниц.
+
+    Результат хранится по ключу (метод извлечения, ссылка, хеш тела
+    страницы, версия кода извлечения). При открытии кеша удаляются
+    записи другой версии того же способа извлечения `backend`: записи
+    других способов остаются, и переключение между ними не сбрасывает
+    кеш. При превышении `max_entries` вытесняются записи, к которым
+    дольше всего не обращались.
+
+    Время обращения при попадании в кеш запоминается в памяти
+    и записывается в базу перед вытеснением и при закрытии кеша,
+    поэтому чтение из кеша не требует транзакции на запись.
+    """
+
+    def __init__(self, path, backend, version,
+                 max_entries=PARSE_CACHE_MAX_ENTRIES):
+        self.backend = backend
+        self.version = version
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._accessed = {}
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        with self._lock, self._connection:
+            columns = [
+                row[1] for row in self._connection.execute(
+                    'PRAGMA table_info(extractions)'
+                )
+            ]
+            if columns and 'backend' not in columns:
+                # Кеш прежней схемы без способа извлечения.
+                self._connection.execute('DROP TABLE extractions')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS extractions ('
+                'method TEXT, url TEXT, body_hash TEXT, backend TEXT, '
+                'version TEXT, result TEXT, accessed REAL, '
+                'PRIMARY KEY (method, url, body_hash, version))'
+            )
+            self._connection.execute(
+                'CREATE INDEX IF NOT EXISTS extractions_accessed '
+                'ON extractions (accessed)'
+            )
+            self._connection.execute(
+                'DELETE FROM extractions WHERE backend = ? AND version != ?',
+                (backend, version)
+            )
+
+    def _flush_accessed(self):
+        self._connection.executemany(
+            'UPDATE extractions SET accessed = ? WHERE method = ? '
+            'AND url = ? AND body_hash = ? AND version = ?',
+            [(accessed, *key) for key, accessed in self._accessed.items()]
+        )
+        self._accessed.clear()
+
+    def get(self, method, url, body_hash):
+        key = (method, url, body_hash, self.version)
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT result FROM extractions WHERE method = ? AND url = ? '
+                'AND body_hash = ? AND version = ?', key
+            ).fetchone()
+            if row is None:
+                return None
+            self._accessed[key] = time.time()
+        result = json.loads(row[0])
+        return tuple(result) if isinstance(result, list) else result
+
+    def set(self, method, url, body_hash, result):
+        with self._lock, self._connection:
+            self._flush_accessed()
+            self._connection.execute(
+                'INSERT OR REPLACE INTO extractions '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (method, url, body_hash, self.backend, self.version,
+                 json.dumps(result), time.time())
+            )
+            self._connection.execute(
+                'DELETE FROM extractions WHERE rowid IN ('
+                'SELECT rowid FROM extractions ORDER BY accessed DESC '
+                'LIMIT -1 OFFSET ?)', (self.max_entries,)
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute(
+                'SELECT COUNT(*) FROM extractions'
+            ).fetchone()[0]
+
+    def close(self):
+        with self._lock, self._connection:
+            self._flush_accessed()
+        self._connection.close()
@@ -0,0 +1,103 @@
+import logging
+import random
+
+from tqdm import tqdm
+
+from constants import (DEFAULT_ENGINE, DEFAULT_PEP_SOURCE, DEFAULT_WORKERS,
+                       DEFAULT_VERIFY_SAMPLE)
+from utils import fetch_all, get_response
+
+
+def card_statuses(session, pep_index, extractor, cli_args=None):
+    """Загружает карточки PEP и возвращает пары (запись, статус)."""
+    responses = fetch_all(
+        session,
+        [record.url for record in pep_index],
+        getattr(cli_args, 'workers', DEFAULT_WORKERS),
+        getattr(cli_args, 'engine', DEFAULT_ENGINE),
+    )
+    statuses = extractor.extract_pages('pep_status', responses)
+    for record, status in tqdm(
+        zip(pep_index, statuses), total=len(pep_index)
+    ):
+        if status is not None:
+            yield record, status
+
+
+def api_statuses(session, api_url):
+    """
+    Загружает статусы всех PEP одним JSON-документом.
+
+    :return: Словарь {номер PEP: статус} или None,
+    если документ недоступен.
+    """
+    response = get_response(session, api_url)
+    if response is None or not response.ok:
+        return None
+    try:
+        return {
+            int(number): pep_data['status']
+            for number, pep_data in response.json().items()
+        }
+    except (ValueError, KeyError, TypeError, AttributeError):
+        logging.exception(f'Не удалось разобрать документ {api_url}')
+        return None
+
+
+def verify_sample(session, api_pairs, sample_size, extractor,
+                  cli_args=None):
+    """
+    Сверяет статусы из JSON-документа со случайными карточками PEP.
+
+    :return: Список записей, статусы которых не совпали.
+    """
+    sample = dict(random.sample(api_pairs, min(sample_size, len(api_pairs))))
+    mismatches = [
+        record
+        for record, status_in_card in card_statuses(
+            session, list(sample), extractor, cli_args
+        )
+        if status_in_card != sample[record]
+    ]
+    for record in mismatches:
+        logging.warning(
+            f'Статус PEP {record.number} в JSON-документе '
+            f'не совпадает с карточкой: {record.url}'
+        )
+    logging.info(
+        f'Проверено карточек: {len(sample)}, расхождений: {len(mismatches)}'
+    )
+    return mismatches
+
+
+def pep_statuses(session, pep_index, api_url, extractor, cli_args=None):
+    """
+    Возвращает пары (запись, статус) из выбранного источника.
+
+    Для источника `api` статусы берутся из JSON-документа;
+    PEP, которых в нём нет, и весь индекс при недоступности
+    документа обрабатываются через карточки PEP.
+    """
+    sample_size = getattr(cli_args, 'verify_sample', DEFAULT_VERIFY_SAMPLE)
+    statuses = None
+    if getattr(cli_args, 'source', DEFAULT_PEP_SOURCE) == 'api':
+        statuses = api_statuses(session, api_url)
+        if statuses is None:
+            logging.warning(
+                'JSON-документ с PEP недоступен, '
+                'статусы будут взяты из карточек'
+            )
+    if statuses is None:
+        return list(card_statuses(session, pep_index, extractor, cli_args))
+    api_pairs = [
+        (record, statuses[record.number])
+        for record in pep_index if record.number in statuses
+    ]
+    if sample_size:
+        verify_sample(session, api_pairs, sample_size, extractor, cli_args)
+    missing = [
+        record for record in pep_index if record.number not in statuses
+    ]
+    return api_pairs + list(
+        card_statuses(session, missing, extractor, cli_args)
+    )
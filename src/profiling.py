@@ -0,0 +1,111 @@
+import json
+import math
+import threading
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+
+import stats
+from constants import PROFILE_PERCENTILES, PROFILE_SLOWEST_URLS
+
+_lock = threading.Lock()
+_enabled = False
+_timings = defaultdict(list)
+_url_timings = []
+_NO_PHASE = nullcontext()
+
+
+class _Phase:
+
+    def __init__(self, name, url):
+        self.name = name
+        self.url = url
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.started
+        with _lock:
+            _timings[self.name].append(elapsed)
+            if self.url is not None:
+                _url_timings.append((elapsed, self.url))
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def reset():
+    with _lock:
+        _timings.clear()
+        _url_timings.clear()
+
+
+def phase(name, url=None):
+    """
+    Замеряет время этапа `name` в блоке `with`.
+
+    Пока замеры не включены через `enable`, возвращает пустой
+    контекстный менеджер, поэтому почти ничего не стоит.
+    """
+    if not _enabled:
+        return _NO_PHASE
+    return _Phase(name, url)
+
+
+def percentile(values, percent):
+    """Процентиль по ближайшему рангу для отсортированного списка."""
+    rank = max(math.ceil(len(values) * percent / 100), 1)
+    return values[rank - 1]
+
+
+def phase_summary(timings):
+    timings = sorted(timings)
+    summary = {
+        'count': len(timings),
+        'total': sum(timings),
+        'mean': sum(timings) / len(timings),
+        'max': timings[-1],
+    }
+    for percent in PROFILE_PERCENTILES:
+        summary[f'p{percent}'] = percentile(timings, percent)
+    return summary
+
+
+def report(mode, duration):
+    """Отчёт о запуске: этапы, попадания в кеш и самые медленные ссылки."""
+    counters = stats.snapshot()
+    with _lock:
+        timings = {name: list(values) for name, values in _timings.items()}
+        slowest = sorted(_url_timings, reverse=True)[:PROFILE_SLOWEST_URLS]
+    return {
+        'mode': mode,
+        'duration': duration,
+        'phases': {
+            name: phase_summary(values) for name, values in timings.items()
+        },
+        'cache': {
+            'hits': (
+                counters.get('pages_cached', 0)
+                + counters.get('pages_unchanged', 0)
+            ),
+            'misses': counters.get('pages_refetched', 0),
+            'revalidated': counters.get('pages_revalidated', 0),
+        },
+        'slowest_urls': [
+            {'url': url, 'seconds': seconds} for seconds, url in slowest
+        ],
+    }
+
+
+def write_report(path, mode, duration):
+    path.parent.mkdir(exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(report(mode, duration), file, ensure_ascii=False, indent=2)
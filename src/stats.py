@@ -0,0 +1,27 @@
+import threading
+from collections import Counter
+
+_lock = threading.Lock()
+_counters = Counter()
+
+
+def increment(name, value=1):
+    """Увеличивает счётчик `name` на `value`; безопасно для потоков."""
+    with _lock:
+        _counters[name] += value
+
+
+def get(name):
+    with _lock:
+        return _counters[name]
+
+
+def snapshot():
+    """Возвращает копию всех счётчиков."""
+    with _lock:
+        return dict(_counters)
+
+
+def reset():
+    with _lock:
+        _counters.clear()
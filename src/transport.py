@@ -0,0 +1,314 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+from requests import ConnectionError, HTTPError, Timeout
+from requests.adapters import HTTPAdapter
+
+import stats
+from constants import (BACKOFF_FACTOR, CONCURRENCY_DECREASE, CONNECT_TIMEOUT,
+                       DEFAULT_RATE_LIMIT, DEFAULT_WORKERS,
+                       IDEMPOTENT_METHODS, INITIAL_CONCURRENCY,
+                       LATENCY_TOLERANCE, MAX_BACKOFF, POOL_CONNECTIONS,
+                       READ_TIMEOUT, RETRIES, RETRY_STATUSES,
+                       THROTTLE_STATUSES)
+
+
+def parse_retry_after(value):
+    """Переводит заголовок `Retry-After` в секунды ожидания."""
+    if not value:
+        return None
+    if value.strip().isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(retry_at.timestamp() - time.time(), 0)
+
+
+class HostLimiter:
+    """
+    Ограничение запросов к одному хосту.
+
+    Частота запросов ограничена корзиной токенов, а число одновременных
+    запросов подбирается по схеме AIMD: после каждого ответа с задержкой
+    не выше `LATENCY_TOLERANCE` от лучшей лимит растёт примерно на
+    единицу за «окно» запросов, а при ответах 429/503 и сетевых ошибках
+    уменьшается в `1 / CONCURRENCY_DECREASE` раз. `Retry-After`
+    приостанавливает выдачу запросов к хосту на указанное время.
+
+    Задержка ответа (`observe`) учитывается по приходу заголовков,
+    а место запроса освобождается (`finish`) после чтения тела.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE_LIMIT,
+                 max_concurrency=DEFAULT_WORKERS,
+                 initial_concurrency=INITIAL_CONCURRENCY):
+        self.rate = rate
+        self.max_concurrency = max_concurrency
+        self.limit = float(min(initial_concurrency, max_concurrency))
+        self.active = 0
+        self.tokens = float(max_concurrency)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.best_latency = None
+        self.condition = threading.Condition()
+
+    def _wait_time(self, now):
+        if self.rate:
+            self.tokens = min(
+                self.tokens + (now - self.updated) * self.rate,
+                float(self.max_concurrency),
+            )
+        self.updated = now
+        if self.blocked_until > now:
+            return self.blocked_until - now
+        if self.active >= int(self.limit):
+            return None
+        if self.rate and self.tokens < 1:
+            return (1 - self.tokens) / self.rate
+        return 0
+
+    def acquire(self):
+        with self.condition:
+            while True:
+                wait = self._wait_time(time.monotonic())
+                if wait == 0:
+                    break
+                self.condition.wait(wait)
+            self.tokens -= 1
+            self.active += 1
+
+    def finish(self):
+        with self.condition:
+            self.active -= 1
+            self.condition.notify_all()
+
+    def release(self, latency, congested=False, retry_after=None):
+        self.observe(latency, congested, retry_after)
+        self.finish()
+
+    def observe(self, latency, congested=False, retry_after=None):
+        with self.condition:
+            if congested:
+                self.limit = max(1.0, self.limit * CONCURRENCY_DECREASE)
+            elif (self.best_latency is None
+                  or latency <= self.best_latency * LATENCY_TOLERANCE):
+                self.limit = min(
+                    float(self.max_concurrency), self.limit + 1 / self.limit
+                )
+            if not congested:
+                self.best_latency = min(
+                    latency, self.best_latency or latency
+                )
+            if retry_after:
+                self.blocked_until = max(
+                    self.blocked_until, time.monotonic() + retry_after
+                )
+            self.condition.notify_all()
+
+
+class HostSlot:
+    """
+    Место в лимите хоста, занятое запросом до конца чтения тела ответа.
+
+    Задержка для подбора лимита — время до получения заголовков:
+    время передачи большого тела не говорит о перегрузке сервера.
+    Место освобождается, когда `requests` и `urllib3` вызывают
+    `release_conn` ответа: тело прочитано до конца или ответ закрыт.
+    """
+
+    def __init__(self, limiter):
+        self.limiter = limiter
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+        self.released = False
+
+    def finish(self):
+        with self.lock:
+            if self.released:
+                return
+            self.released = True
+        self.limiter.finish()
+
+    def hold(self, response):
+        """Освобождает место, когда тело ответа прочитано или закрыто."""
+        self.limiter.observe(
+            time.monotonic() - self.started,
+            response.status_code in THROTTLE_STATUSES,
+            parse_retry_after(response.headers.get('Retry-After')),
+        )
+        raw = response.raw
+        release_conn = getattr(raw, 'release_conn', None)
+        if release_conn is None:
+            self.finish()
+            return
+
+        def release_body():
+            self.finish()
+            release_conn()
+
+        raw.release_conn = release_body
+        count_wire_bytes(raw)
+
+
+def count_wire_bytes(raw):
+    """
+    Учитывает в `http_bytes` байты тела ответа `raw`, полученные из сети.
+
+    Байты считаются до распаковки `Content-Encoding` и без служебных
+    строк `Transfer-Encoding: chunked`: `urllib3` читает обычное тело
+    через `_fp_read`, а части chunked-ответа — через `_handle_chunk`.
+    """
+    name = '_handle_chunk' if raw.chunked else '_fp_read'
+    read = getattr(raw, name)
+
+    def counted_read(*args, **kwargs):
+        data = read(*args, **kwargs)
+        stats.increment('http_bytes', len(data))
+        return data
+
+    setattr(raw, name, counted_read)
+
+
+class LimitedAdapter(HTTPAdapter):
+    """HTTP-адаптер, пропускающий запросы к хостам через `HostLimiter`."""
+
+    def __init__(self, rate=DEFAULT_RATE_LIMIT,
+                 max_concurrency=DEFAULT_WORKERS, **kwargs):
+        self.rate = rate
+        self.max_concurrency = max_concurrency
+        self.limiters = {}
+        self.limiters_lock = threading.Lock()
+        super().__init__(**kwargs)
+
+    def limiter(self, url, stream=False):
+        """
+        Ограничение запросов к хосту ссылки `url`.
+
+        Потоковые загрузки (`stream=True`) ограничиваются отдельно
+        и сразу получают все `max_concurrency` мест: долгие передачи
+        архивов не занимают места страниц и не ждут роста лимита.
+        """
+        key = (urlsplit(url).netloc, stream)
+        with self.limiters_lock:
+            if key not in self.limiters:
+                self.limiters[key] = HostLimiter(
+                    self.rate, self.max_concurrency,
+                    self.max_concurrency if stream else INITIAL_CONCURRENCY,
+                )
+            return self.limiters[key]
+
+    def send(self, request, stream=False, **kwargs):
+        limiter = self.limiter(request.url, stream)
+        limiter.acquire()
+        slot = HostSlot(limiter)
+        try:
+            response = super().send(request, stream=stream, **kwargs)
+        except BaseException:
+            limiter.observe(time.monotonic() - slot.started, congested=True)
+            slot.finish()
+            raise
+        stats.increment('http_requests')
+        slot.hold(response)
+        return response
+
+    def concurrency(self):
+        """Текущий лимит одновременных запросов для каждого хоста."""
+        with self.limiters_lock:
+            return {
+                f'{host} (загрузка файлов)' if stream else host: limiter.limit
+                for (host, stream), limiter in self.limiters.items()
+            }
+
+
+class Transport:
+    """
+    Отправка запросов с таймаутами и повторами.
+
+    Идемпотентные запросы повторяются при сетевых ошибках и ответах
+    со статусами из `RETRY_STATUSES` с экспоненциально растущей паузой
+    и случайным разбросом. Повторы и неудачные запросы учитываются
+    в счётчиках `request_retries` и `request_failures`.
+    """
+
+    def __init__(self, connect_timeout=CONNECT_TIMEOUT,
+                 read_timeout=READ_TIMEOUT, retries=RETRIES,
+                 backoff_factor=BACKOFF_FACTOR, max_backoff=MAX_BACKOFF,
+                 adapter=None):
+        self.adapter = adapter
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+
+    def backoff_time(self, attempt):
+        """Пауза перед повтором: случайная в пределах экспоненты."""
+        return random.uniform(
+            0, min(self.max_backoff, self.backoff_factor * 2 ** attempt)
+        )
+
+    def request(self, session, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        retries = self.retries if method in IDEMPOTENT_METHODS else 0
+        for attempt in range(retries + 1):
+            try:
+                response = session.request(method, url, **kwargs)
+            except (ConnectionError, Timeout):
+                if attempt == retries:
+                    stats.increment('request_failures')
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    return response
+                if attempt == retries:
+                    stats.increment('request_failures')
+                    raise HTTPError(
+                        f'{response.status_code} после {attempt} повторов',
+                        response=response,
+                    )
+                response.close()
+            stats.increment('request_retries')
+            time.sleep(self.backoff_time(attempt))
+
+    def concurrency(self):
+        if self.adapter is None:
+            return {}
+        return self.adapter.concurrency()
+
+
+def get_transport(session):
+    return getattr(session, 'transport', None) or Transport()
+
+
+def send(session, method, url, **kwargs):
+    """Отправляет запрос через транспорт сессии."""
+    return get_transport(session).request(session, method, url, **kwargs)
+
+
+def mount_transport(session, cli_args=None):
+    """
+    Настраивает сессию: пул соединений по числу потоков и транспорт.
+
+    Размер пула не меньше количества потоков загрузки, чтобы потоки
+    не открывали лишние соединения сверх пула. Число одновременных
+    запросов к хосту ограничено тем же количеством потоков.
+    """
+    workers = getattr(cli_args, 'workers', DEFAULT_WORKERS)
+    adapter = LimitedAdapter(
+        rate=getattr(cli_args, 'rate', DEFAULT_RATE_LIMIT),
+        max_concurrency=workers,
+        pool_connections=POOL_CONNECTIONS,
+        pool_maxsize=max(workers, POOL_CONNECTIONS),
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.transport = Transport(
+        read_timeout=getattr(cli_args, 'timeout', READ_TIMEOUT),
+        retries=getattr(cli_args, 'retries', RETRIES),
+        adapter=adapter,
+    )
+    return session
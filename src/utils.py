@@ -1,14 +1,50 @@
+import asyncio
 import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
+from bs4 import BeautifulSoup, SoupStrainer
 from requests import RequestException
 
+import profiling
+import stats
+from constants import DEFAULT_ENGINE, DEFAULT_WORKERS
 from exceptions import ParserFindTagException
+from transport import send
+
+CONDITIONAL_HEADERS = ('If-None-Match', 'If-Modified-Since')
+
+
+def count_cache_status(response):
+    """
+    Учитывает, откуда получена страница.
+
+    `pages_cached` — из кеша без запроса, `pages_revalidated` — отправлен
+    условный запрос, `pages_unchanged` — сервер ответил 304,
+    `pages_refetched` — страница загружена целиком.
+    """
+    if getattr(response, 'revalidated', False):
+        stats.increment('pages_revalidated')
+        stats.increment('pages_unchanged')
+    elif getattr(response, 'from_cache', False):
+        stats.increment('pages_cached')
+    else:
+        stats.increment('pages_refetched')
+        if any(
+            header in response.request.headers
+            for header in CONDITIONAL_HEADERS
+        ):
+            stats.increment('pages_revalidated')
 
 
 def get_response(session, url):
     try:
-        response = session.get(url)
+        with profiling.phase('get_response', url):
+            response = send(session, 'GET', url)
         response.encoding = 'utf-8'
+        count_cache_status(response)
         return response
     except RequestException:
         logging.exception(
@@ -17,8 +53,99 @@ def get_response(session, url):
         )
 
 
+def fetch_all(session, urls, workers=DEFAULT_WORKERS, engine=DEFAULT_ENGINE):
+    """
+    Загружает страницы параллельно.
+
+    Ответы возвращаются в том же порядке, что и ссылки,
+    вне зависимости от порядка завершения загрузок. Каждый ответ
+    выдаётся, как только загружены он и все ответы перед ним.
+    """
+    if engine == 'async':
+        yield from iterate_async(fetch_all_async(session, urls, workers))
+        return
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        yield from executor.map(partial(get_response, session), urls)
+
+
+def iterate_async(generator):
+    """
+    Выдаёт значения асинхронного генератора в синхронном коде.
+
+    Цикл событий работает в отдельном потоке, поэтому загрузки
+    продолжаются, пока вызывающий код обрабатывает полученные значения.
+    """
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        while True:
+            try:
+                yield asyncio.run_coroutine_threadsafe(
+                    generator.__anext__(), loop
+                ).result()
+            except StopAsyncIteration:
+                return
+    finally:
+        asyncio.run_coroutine_threadsafe(generator.aclose(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
+async def fetch_all_async(session, urls, workers=DEFAULT_WORKERS):
+    """
+    Загружает страницы корутинами, не более `workers` одновременно.
+
+    Ответы выдаются в порядке ссылок по мере загрузки. Запросы
+    выполняются через ту же сессию, поэтому используют и пополняют
+    общий кеш `requests_cache`. Блокирующие запросы идут в отдельном
+    пуле из `workers` потоков: пул потоков цикла событий по умолчанию
+    меньше и ограничил бы число одновременных запросов.
+    """
+    workers = max(workers, 1)
+    semaphore = asyncio.Semaphore(workers)
+    loop = asyncio.get_running_loop()
+
+    async def fetch(url):
+        async with semaphore:
+            return await loop.run_in_executor(
+                executor, get_response, session, url
+            )
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        tasks = [asyncio.ensure_future(fetch(url)) for url in urls]
+        try:
+            for task in tasks:
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+PARSE_TARGETS = {
+    'whats-new': SoupStrainer(['h1', 'dl']),
+    'pep': SoupStrainer('dl', attrs={'class': re.compile(r'\bfield-list\b')}),
+}
+"""Части страниц, которые нужны режимам при разборе отдельных страниц."""
+
+
+def make_soup(text, target=None):
+    """
+    Разбирает HTML-страницу.
+
+    Если указана цель из `PARSE_TARGETS`, строится только
+    нужная режиму часть дерева.
+    """
+    with profiling.phase('make_soup'):
+        return BeautifulSoup(
+            text, features='lxml', parse_only=PARSE_TARGETS.get(target)
+        )
+
+
 def find_tag(soup, tag, attrs=None):
-    searched_tag = soup.find(tag, attrs=(attrs or {}))
+    with profiling.phase('find_tag'):
+        searched_tag = soup.find(tag, attrs=(attrs or {}))
     if searched_tag is None:
         error_msg = f'Не найден тег {tag} {attrs}'
         logging.error(error_msg, stack_info=True)
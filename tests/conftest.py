@@ -1,6 +1,15 @@
+import io
+import os
+import random
+import re
 import pytest
+import shutil
 import sys
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
+from types import SimpleNamespace
 from bs4 import BeautifulSoup
 import requests_mock
 from argparse import Namespace
@@ -16,6 +25,15 @@ sys.path.append(str(SRC_DIR))
 
 MAIN_DOC_URL = 'https://docs.python.org/3/'
 PEP_URL = 'https://www.python.org/dev/peps/'
+SITE_DIR = BASE_DIR / 'tests' / 'fixture_data' / 'site'
+ARCHIVE_NAMES = (
+    'python-3.12-docs-pdf-a4.zip',
+    'python-3.12-docs-pdf-letter.zip',
+    'python-3.12-docs-html.zip',
+    'python-3.12-docs-text.zip',
+    'python-3.12-docs.epub',
+)
+ARCHIVE_SIZE = 300 * 1024
 
 
 precode_files = ['constants.py', 'main.py', 'utils.py']
@@ -110,3 +128,94 @@ def records():
         result = results[mode]
         return converting(result)
     return _records
+
+
+class FixtureSiteHandler(SimpleHTTPRequestHandler):
+    """
+    Отдаёт страницы из `fixture_data/site` без вывода логов.
+
+    Поддерживает ETag, If-None-Match и запросы с Range,
+    а также записывает все полученные запросы в `server.requests`.
+    """
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_head(self):
+        self.server.requests.append(
+            (self.command, self.path, self.headers.get('Range'))
+        )
+        path = self.translate_path(self.path)
+        if os.path.isdir(path) and self.path.split('?')[0].endswith('/'):
+            path = os.path.join(path, 'index.html')
+        if not os.path.isfile(path):
+            return super().send_head()
+        stat = os.stat(path)
+        size = stat.st_size
+        etag = f'"{size:x}-{stat.st_mtime_ns:x}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return None
+        start, end = 0, size - 1
+        range_match = re.fullmatch(
+            r'bytes=(\d+)-(\d*)', self.headers.get('Range', '')
+        )
+        if_range = self.headers.get('If-Range')
+        if range_match and if_range in (None, etag):
+            start = int(range_match[1])
+            end = min(int(range_match[2] or end), end)
+            if start > end:
+                self.send_error(416)
+                return None
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        else:
+            self.send_response(200)
+        with open(path, 'rb') as file:
+            file.seek(start)
+            body = file.read(end - start + 1)
+        self.send_header('Content-Type', self.guess_type(path))
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', self.date_time_string(stat.st_mtime))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.end_headers()
+        return io.BytesIO(body)
+
+
+def make_archives(archives_dir: Path) -> None:
+    archives_dir.mkdir()
+    for archive_name in ARCHIVE_NAMES:
+        archive = archives_dir / archive_name
+        archive.write_bytes(random.Random(archive_name).randbytes(ARCHIVE_SIZE))
+
+
+@pytest.fixture
+def local_site(tmp_path, monkeypatch):
+    """Локальный HTTP-сервер с копиями страниц docs.python.org и PEP."""
+    site_dir = tmp_path / 'site'
+    shutil.copytree(SITE_DIR, site_dir)
+    make_archives(site_dir / 'docs' / '3' / 'archives')
+    server = ThreadingHTTPServer(
+        ('127.0.0.1', 0),
+        partial(FixtureSiteHandler, directory=str(site_dir)),
+    )
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f'http://127.0.0.1:{server.server_port}/'
+    site = SimpleNamespace(
+        url=base_url,
+        root=site_dir,
+        doc_url=base_url + 'docs/3/',
+        pep_url=base_url + 'peps/',
+        requests=server.requests,
+    )
+    monkeypatch.setattr(main, 'MAIN_DOC_URL', site.doc_url)
+    monkeypatch.setattr(main, 'MAIN_DOC_PEP_URL', site.pep_url)
+    monkeypatch.setattr(main, 'BASE_DIR', tmp_path)
+    yield site
+    server.shutdown()
+    server.server_close()
@@ -1,3 +1,6 @@
+import logging
+import threading
+
 import pytest
 import argparse
 try:
@@ -29,7 +32,7 @@ def test_configs_file():
     ),
     (
         argparse._StoreAction, ['-o', '--output'], 'output',
-        ('pretty', 'file'),
+        ('pretty', 'file', 'jsonl', 'sqlite'),
         'Дополнительные способы вывода данных'
     ),
 ])
@@ -64,3 +67,38 @@ def test_configure_argument_parser(
     assert got_action.help == help_str, (
         f'Укажите help-строку cli аргумента {got_action.dest}'
     )
+
+
+def test_output_accepts_several_sinks():
+    parser = configs.configure_argument_parser(['pep'])
+    got = parser.parse_args(['pep', '-o', 'pretty', 'file', 'sqlite'])
+    assert got.output == ['pretty', 'file', 'sqlite']
+    assert parser.parse_args(['pep']).output is None
+
+
+def test_configure_logging_writes_from_listener(monkeypatch, tmp_path):
+    root = logging.getLogger()
+    monkeypatch.setattr(configs, 'BASE_DIR', tmp_path)
+    monkeypatch.setattr(root, 'handlers', [])
+    monkeypatch.setattr(root, 'level', root.level)
+    listener = configs.configure_logging()
+    writers = []
+    for handler in listener.handlers:
+        monkeypatch.setattr(
+            handler, 'emit',
+            lambda record, emit=handler.emit: (
+                writers.append(threading.current_thread()), emit(record)
+            )
+        )
+    try:
+        logging.info('Запись через очередь')
+    finally:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+    assert writers and threading.current_thread() not in writers, (
+        'Записи журнала должны писаться отдельным потоком'
+    )
+    log_text = (tmp_path / 'logs' / 'parser.log').read_text(encoding='utf-8')
+    assert log_text.count('Запись через очередь') == 1
+    assert '[INFO] - Запись через очередь' in log_text
@@ -0,0 +1,72 @@
+import pytest
+import requests
+import requests_mock
+
+import downloader
+
+URL = 'https://docs.python.org/3/archives/python-docs.zip'
+BODY = bytes(range(256)) * 16
+ETAG = '"v1"'
+
+
+def segment_response(request, context, body=BODY, content_range=None):
+    start, end = map(int, request.headers['Range'][6:].split('-'))
+    if request.headers.get('If-Range') != ETAG:
+        context.status_code = 200
+        return body
+    context.status_code = 206
+    context.headers['Content-Range'] = (
+        content_range or f'bytes {start}-{end}/{len(body)}'
+    )
+    return body[start:end + 1]
+
+
+@pytest.fixture
+def mock_server():
+    session = requests.Session()
+    adapter = requests_mock.Adapter()
+    session.mount('https://', adapter)
+    return session, adapter
+
+
+def test_download_segments_sends_if_range(mock_server, tmp_path):
+    session, adapter = mock_server
+    adapter.register_uri('GET', URL, content=segment_response)
+    path = tmp_path / 'python-docs.zip'
+    downloader.download_segments(session, URL, path, len(BODY), 4, ETAG)
+    assert path.read_bytes() == BODY
+    assert all(
+        request.headers['If-Range'] == ETAG
+        for request in adapter.request_history
+    )
+
+
+@pytest.mark.parametrize('content', [
+    lambda request, context: segment_response(
+        request, context, body=BODY[:-1]
+    ),
+    lambda request, context: segment_response(
+        request, context, content_range='bytes 0-99/4096'
+    ),
+    lambda request, context: segment_response(request, context)[:-1],
+], ids=['file-changed', 'wrong-range', 'short-segment'])
+def test_download_segments_rejects_mismatch(mock_server, tmp_path, content):
+    session, adapter = mock_server
+    adapter.register_uri('GET', URL, content=content)
+    path = tmp_path / 'python-docs.zip'
+    with pytest.raises(ValueError):
+        downloader.download_segments(
+            session, URL, path, len(BODY), 4, ETAG
+        )
+    assert not path.exists()
+
+
+def test_download_segments_file_replaced(mock_server, tmp_path):
+    session, adapter = mock_server
+    adapter.register_uri('GET', URL, content=segment_response)
+    path = tmp_path / 'python-docs.zip'
+    with pytest.raises(ValueError, match='файл мог измениться'):
+        downloader.download_segments(
+            session, URL, path, len(BODY), 4, '"v0"'
+        )
+    assert not path.exists()
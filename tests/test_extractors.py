@@ -0,0 +1,201 @@
+import pytest
+from argparse import Namespace
+
+import stats
+from conftest import MAIN_DOC_URL, SITE_DIR
+try:
+    from src import extractors, main
+except ModuleNotFoundError:
+    assert False, 'Убедитесь что в директории `src` есть файл `extractors.py`'
+except ImportError:
+    assert False, 'Убедитесь что в директории `src` есть файл `extractors.py`'
+
+
+def read_page(page):
+    return (SITE_DIR / page).read_text(encoding='utf-8')
+
+
+@pytest.mark.parametrize('method, page, args', [
+    ('whats_new_links', 'docs/3/whatsnew/index.html', (MAIN_DOC_URL,)),
+    ('whats_new_page', 'docs/3/whatsnew/3.12.html', ()),
+    ('version_links', 'docs/3/index.html', ()),
+    ('archive_link', 'docs/3/download.html', (r'.+pdf-a4\.zip$',)),
+    ('archive_link', 'docs/3/download.html', (r'.+\.epub$',)),
+    ('pep_status', 'peps/pep-0001/index.html', ()),
+    ('pep_status', 'peps/pep-0745/index.html', ()),
+])
+def test_backends_return_same_results(method, page, args):
+    text = read_page(page)
+    got = {
+        name: getattr(extractors.get_extractor(name), method)(text, *args)
+        for name in extractors.EXTRACTORS
+    }
+    assert got['lxml'] == got['bs4'], (
+        f'Метод `{method}` должен возвращать одинаковый результат '
+        'для всех способов разбора'
+    )
+
+
+def test_build_pep_index():
+    text = read_page('peps/index.html')
+    got = {
+        name: extractors.build_pep_index(
+            extractors.get_extractor(name), text, 'https://peps.python.org/'
+        )
+        for name in extractors.EXTRACTORS
+    }
+    assert got['lxml'] == got['bs4']
+    numbers = [record.number for record in got['lxml']]
+    assert sorted(numbers) == [1, 12, 484, 572, 745, 3000], (
+        'Каждый PEP должен попадать в индекс ровно один раз'
+    )
+    assert got['lxml'][0] == (1, 'https://peps.python.org/pep-0001/', 'PA')
+
+
+def test_extractors_match_parser_choices():
+    from constants import PARSER_BACKENDS
+    assert sorted(extractors.EXTRACTORS) == sorted(PARSER_BACKENDS)
+
+
+@pytest.mark.parametrize('name', extractors.EXTRACTORS)
+def test_backend_not_found_exception(name):
+    with pytest.raises(BaseException) as excinfo:
+        extractors.get_extractor(name).whats_new_page('<html></html>')
+    assert excinfo.typename == 'ParserFindTagException'
+
+
+@pytest.mark.parametrize('mode', ['whats_new', 'latest_versions', 'pep'])
+def test_modes_with_each_backend(local_site, tempfile_session, mode):
+    mode_function = getattr(main, mode)
+    got = [
+        mode_function(tempfile_session, Namespace(parser=name))
+        for name in extractors.EXTRACTORS
+    ]
+    assert got[0] == got[1]
+    assert len(got[0]) > 1
+
+
+def test_parse_cache_skips_parsing(
+        monkeypatch, tmp_path, local_site, tempfile_session
+):
+    import extractors as runtime_extractors
+    monkeypatch.setattr(
+        runtime_extractors, 'PARSE_CACHE_PATH', tmp_path / 'parse.sqlite3'
+    )
+    cli_args = Namespace(parse_cache=True)
+    cold = main.whats_new(tempfile_session, cli_args)
+
+    def fail(self, text):
+        raise AssertionError('Страница не должна разбираться повторно')
+
+    monkeypatch.setattr(
+        runtime_extractors.LxmlExtractor, 'whats_new_page', fail
+    )
+    assert main.whats_new(tempfile_session, cli_args) == cold
+
+
+@pytest.mark.parametrize('parser', ['lxml', 'bs4'])
+@pytest.mark.parametrize('mode', ['whats_new', 'pep'])
+def test_parse_procs(local_site, tempfile_session, mode, parser):
+    mode_function = getattr(main, mode)
+    in_threads = mode_function(
+        tempfile_session, Namespace(parser=parser, workers=4)
+    )
+    in_processes = mode_function(
+        tempfile_session, Namespace(parser=parser, workers=4, parse_procs=2)
+    )
+    assert in_processes == in_threads, (
+        f'Режим `{mode}` должен возвращать одинаковые результаты '
+        'при разборе в процессах'
+    )
+
+
+def test_parse_procs_with_parse_cache(
+        monkeypatch, tmp_path, local_site, tempfile_session
+):
+    import extractors as runtime_extractors
+    monkeypatch.setattr(
+        runtime_extractors, 'PARSE_CACHE_PATH', tmp_path / 'parse.sqlite3'
+    )
+    cli_args = Namespace(parse_cache=True, parse_procs=2)
+    cold = main.whats_new(tempfile_session, cli_args)
+    parsed = stats.get('pages_parsed')
+    assert main.whats_new(tempfile_session, cli_args) == cold
+    assert stats.get('pages_parsed') == parsed, (
+        'Страницы из кеша разбора не должны разбираться повторно'
+    )
+
+
+def test_incremental_skips_parsing_unchanged_pages(
+        monkeypatch, tmp_path, local_site
+):
+    import extractors as runtime_extractors
+    from requests_cache import CachedSession
+    monkeypatch.setattr(
+        runtime_extractors, 'PARSE_CACHE_PATH', tmp_path / 'parse.sqlite3'
+    )
+    session = CachedSession(backend='memory', always_revalidate=True)
+    cli_args = Namespace(incremental=True)
+    cold = main.whats_new(session, cli_args)
+    stats.reset()
+    assert main.whats_new(session, cli_args) == cold
+    assert stats.get('pages_unchanged')
+    assert stats.get('pages_parsed') == 0, (
+        'Страницы, не изменившиеся на сервере, не должны разбираться '
+        'повторно'
+    )
+
+
+def test_parse_cache_version_and_eviction(tmp_path):
+    from parse_cache import ParseCache
+    path = tmp_path / 'parse.sqlite3'
+    cache = ParseCache(path, 'lxml', 'v1', max_entries=2)
+    for number in range(3):
+        cache.set('pep_status', f'pep-{number}', 'hash', 'Active')
+    cache.get('pep_status', 'pep-1', 'hash')
+    cache.set('pep_status', 'pep-3', 'hash', ('a', 'b'))
+    assert len(cache) == 2
+    assert cache.get('pep_status', 'pep-1', 'hash') == 'Active'
+    assert cache.get('pep_status', 'pep-3', 'hash') == ('a', 'b')
+    assert cache.get('pep_status', 'pep-2', 'hash') is None
+    cache.close()
+
+    cache = ParseCache(path, 'lxml', 'v2', max_entries=2)
+    assert len(cache) == 0, (
+        'Записи другой версии кода извлечения должны удаляться'
+    )
+    cache.close()
+
+
+def test_parse_cache_keeps_other_backends(tmp_path):
+    from parse_cache import ParseCache
+    path = tmp_path / 'parse.sqlite3'
+    cache = ParseCache(path, 'lxml', 'lxml-v1')
+    cache.set('pep_status', 'pep-1', 'hash', 'Active')
+    cache.close()
+    cache = ParseCache(path, 'html.parser', 'html.parser-v1')
+    cache.set('pep_status', 'pep-1', 'hash', 'Final')
+    cache.close()
+    cache = ParseCache(path, 'lxml', 'lxml-v1')
+    assert cache.get('pep_status', 'pep-1', 'hash') == 'Active', (
+        'Переключение способа извлечения не должно сбрасывать кеш'
+    )
+    assert len(cache) == 2
+    cache.close()
+
+
+def test_parse_cache_shared_between_extractors(monkeypatch, tmp_path):
+    import extractors as runtime_extractors
+    monkeypatch.setattr(
+        runtime_extractors, 'PARSE_CACHE_PATH', tmp_path / 'parse.sqlite3'
+    )
+    cli_args = Namespace(parse_cache=True)
+    first = runtime_extractors.extractor_for(cli_args)
+    second = runtime_extractors.extractor_for(cli_args)
+    assert first.parse_cache is second.parse_cache, (
+        'Кеш разбора должен открываться один раз на запуск'
+    )
+    runtime_extractors.close_parse_caches()
+    third = runtime_extractors.extractor_for(cli_args)
+    assert third.parse_cache is not first.parse_cache
+    runtime_extractors.close_parse_caches()
@@ -0,0 +1,173 @@
+from argparse import Namespace
+
+import pytest
+
+import http_cache
+import stats
+from src import main
+
+
+@pytest.fixture
+def cache_session(monkeypatch, tmp_path):
+    monkeypatch.setattr(http_cache, 'CACHE_NAME', str(tmp_path / 'cache'))
+    monkeypatch.setattr(
+        http_cache, 'CACHE_STATS_PATH', tmp_path / 'cache_stats.sqlite3'
+    )
+
+    def _cache_session(**options):
+        return http_cache.create_session(Namespace(**options))
+    return _cache_session
+
+
+def test_parse_expire_rule():
+    assert http_cache.parse_expire_rule('peps.python.org/pep-=60') == (
+        'peps.python.org/pep-', 60
+    )
+    with pytest.raises(ValueError):
+        http_cache.parse_expire_rule('60')
+
+
+def test_urls_expire_after_cli_rules_first():
+    rules = http_cache.urls_expire_after(
+        Namespace(expire=[('127.0.0.1', 5)])
+    )
+    assert list(rules)[0] == '127.0.0.1'
+    assert rules['peps.python.org/pep-'] == 7 * 24 * 60 * 60
+
+
+@pytest.mark.parametrize('backend', ['sqlite', 'filesystem', 'memory'])
+def test_create_session_backends(cache_session, local_site, backend):
+    session = cache_session(
+        cache_backend=backend, expire=[(local_site.pep_url, 0)]
+    )
+    session.get(local_site.doc_url)
+    session.get(local_site.pep_url)
+    session.get(local_site.doc_url)
+    session.get(local_site.pep_url)
+    paths = [request[1] for request in local_site.requests]
+    assert paths.count('/docs/3/') == 1
+    assert paths.count('/peps/') == 2, (
+        'Срок хранения из правила должен применяться к ссылкам по шаблону'
+    )
+
+
+def test_cache_mode_report_and_eviction(cache_session, local_site):
+    session = cache_session(cache_backend='sqlite')
+    stats.reset()
+    urls = [local_site.doc_url, local_site.pep_url]
+    for url in urls + urls:
+        main.get_response(session, url)
+    session.cache_usage.save('pep')
+
+    report = dict(main.cache(session, Namespace())[1:])
+    assert report['Записей'] == 2
+    assert report['Попаданий в кеш'] == 2
+    assert report['Промахов'] == 2
+    assert report['Доля попаданий'] == '50.00%'
+
+    main.get_response(session, local_site.doc_url)
+    session.cache_usage.save('pep')
+    sizes = http_cache.response_sizes(session.cache)
+    evicted = http_cache.evict_to_size(
+        session.cache, session.cache_usage, max(sizes.values())
+    )
+    assert evicted == 1
+    assert session.cache.contains(url=local_site.doc_url), (
+        'Вытесняться должны давно не использованные записи'
+    )
+
+
+@pytest.mark.parametrize('compression', ['zlib', 'lzma'])
+def test_compressed_cache(monkeypatch, tmp_path, local_site, compression):
+    def cached_size(name, **options):
+        monkeypatch.setattr(http_cache, 'CACHE_NAME', str(tmp_path / name))
+        session = http_cache.create_session(
+            Namespace(cache_backend='sqlite', **options)
+        )
+        response = session.get(local_site.pep_url)
+        cached = session.get(local_site.pep_url)
+        assert cached.from_cache
+        assert cached.content == response.content
+        return sum(http_cache.response_sizes(session.cache).values())
+
+    assert cached_size(compression, cache_compression=compression) < (
+        cached_size('plain')
+    ), 'Ответы в кеше должны храниться в сжатом виде'
+
+
+def test_sqlite_cache_concurrent_access(cache_session, local_site):
+    from concurrent.futures import ThreadPoolExecutor
+    session = cache_session(cache_backend='sqlite')
+    with session.cache.responses.connection() as connection:
+        journal_mode = connection.execute('PRAGMA journal_mode').fetchone()
+    assert journal_mode[0] == 'wal'
+
+    pages = [
+        f'{local_site.pep_url}pep-{number:04d}/?copy={copy}'
+        for number in (1, 12, 484, 572, 745, 3000)
+        for copy in range(10)
+    ]
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        responses = list(executor.map(
+            lambda url: main.get_response(session, url), pages * 5
+        ))
+    assert all(
+        response is not None and response.status_code == 200
+        for response in responses
+    ), 'Сессия должна выдерживать одновременные запросы из многих потоков'
+    assert len(session.cache.responses) == len(pages)
+
+
+def test_prefetch_then_offline(cache_session, local_site):
+    session = cache_session(cache_backend='sqlite')
+    got = main.prefetch(session, Namespace(workers=4))
+    assert got[0] == ('Страницы', 'Ссылок', 'В кеше', 'Покрытие')
+    assert [row[0] for row in got[1:]] == [
+        'Главные страницы', "Статьи What's New", 'Карточки PEP'
+    ]
+    assert all(row[1] == row[2] and row[3] == '100%' for row in got[1:])
+    online_pep = main.pep(session)
+
+    local_site.requests.clear()
+    offline_session = cache_session(
+        cache_backend='sqlite', offline=True, expire=[(local_site.url, 0)]
+    )
+    assert main.pep(offline_session) == online_pep
+    assert main.whats_new(offline_session)
+    assert main.latest_versions(offline_session)
+    assert not local_site.requests, (
+        'В автономном режиме запросы к серверу не отправляются'
+    )
+    with pytest.raises(http_cache.CacheMissException):
+        main.get_response(offline_session, local_site.url + 'missing/')
+    assert not local_site.requests
+
+
+def test_prefetch_then_offline_all_modes(monkeypatch, cache_session,
+                                        local_site):
+    import outputs
+    monkeypatch.setattr(outputs, 'BASE_DIR', local_site.root.parent)
+    session = cache_session(cache_backend='sqlite')
+    main.prefetch(session, Namespace(workers=4))
+    local_site.requests.clear()
+    offline_session = cache_session(
+        cache_backend='sqlite', offline=True, expire=[(local_site.url, 0)]
+    )
+    main.all_modes(
+        offline_session, Namespace(output=['file'], workers=2, offline=True)
+    )
+    assert not local_site.requests
+    results = local_site.root.parent / 'results'
+    assert sorted(path.name.split('_')[0] for path in results.iterdir()) == [
+        'latest-versions', 'pep', 'whats-new'
+    ]
+
+
+def test_offline_all_modes_fail_on_cache_miss(monkeypatch, cache_session,
+                                              local_site):
+    import outputs
+    monkeypatch.setattr(outputs, 'BASE_DIR', local_site.root.parent)
+    offline_session = cache_session(cache_backend='sqlite', offline=True)
+    with pytest.raises(http_cache.CacheMissException):
+        main.all_modes(offline_session, Namespace(workers=2))
+    assert not local_site.requests
@@ -1,4 +1,7 @@
+import logging
+
 import pytest
+from argparse import Namespace
 from pathlib import Path
 try:
     from src import main
@@ -140,3 +143,186 @@ def test_mode_to_function():
             'В модуле `main.py` в объекте `MODE_TO_FUNCTION` '
             f'нет значения {func}'
         )
+
+
+def test_pep_workers(local_site, tempfile_session):
+    expected = [
+        ('Статус', 'Количество'),
+        ('Active', 2),
+        ('Withdrawn', 2),
+        ('Draft', 1),
+        ('Final', 1),
+        ('Total', 6),
+    ]
+    sequential = main.pep(tempfile_session, Namespace(workers=1))
+    concurrent = main.pep(tempfile_session, Namespace(workers=4))
+    assert sequential == expected
+    card_requests = [
+        request for request in local_site.requests
+        if request[1].startswith('/peps/pep-')
+    ]
+    assert len(card_requests) == 6, (
+        'Каждая карточка PEP должна загружаться один раз'
+    )
+    assert concurrent == sequential, (
+        'Результаты режима `pep` не должны зависеть от количества потоков'
+    )
+
+
+@pytest.mark.parametrize('mode_function', ['whats_new', 'pep'])
+def test_async_engine(local_site, tempfile_session, mode_function):
+    mode = getattr(main, mode_function)
+    threads = mode(tempfile_session, Namespace(workers=4, engine='threads'))
+    async_engine = mode(
+        tempfile_session, Namespace(workers=4, engine='async')
+    )
+    assert len(threads) > 1
+    assert async_engine == threads, (
+        f'Режим `{mode_function}` должен возвращать одинаковые результаты '
+        'для обоих способов загрузки'
+    )
+
+
+def test_download_streaming_resume(local_site, tempfile_session):
+    archive_name = 'python-3.12-docs-pdf-a4.zip'
+    source = local_site.root / 'docs' / '3' / 'archives' / archive_name
+    archive = local_site.root.parent / 'downloads' / archive_name
+    source_bytes = source.read_bytes()
+
+    assert main.download(tempfile_session) is None
+    assert archive.read_bytes() == source_bytes
+    assert not tempfile_session.cache.contains(
+        url=local_site.doc_url + 'archives/' + archive_name
+    ), 'Архив не должен сохраняться в кеше запросов'
+
+    archive.unlink()
+    part = archive.with_name(archive_name + '.part')
+    part.write_bytes(source_bytes[:1000])
+    main.download(tempfile_session)
+    assert archive.read_bytes() == source_bytes
+    assert not part.exists()
+    assert ('GET', f'/docs/3/archives/{archive_name}', 'bytes=1000-') in (
+        local_site.requests
+    ), 'Прерванная загрузка должна продолжаться запросом с Range'
+
+    local_site.requests.clear()
+    main.download(tempfile_session)
+    archive_gets = [
+        request for request in local_site.requests
+        if request[0] == 'GET' and request[1].endswith(archive_name)
+    ]
+    assert not archive_gets, (
+        'Уже загруженный архив не должен скачиваться повторно'
+    )
+
+
+def test_download_formats_segmented(monkeypatch, local_site, tempfile_session):
+    import downloader
+    monkeypatch.setattr(downloader, 'SEGMENTED_DOWNLOAD_MIN_SIZE', 1024)
+    formats = ['pdf-a4', 'html', 'epub']
+    main.download(tempfile_session, Namespace(formats=formats))
+    archives_dir = local_site.root / 'docs' / '3' / 'archives'
+    downloads_dir = local_site.root.parent / 'downloads'
+    for name in (
+        'python-3.12-docs-pdf-a4.zip',
+        'python-3.12-docs-html.zip',
+        'python-3.12-docs.epub',
+    ):
+        assert (downloads_dir / name).read_bytes() == (
+            (archives_dir / name).read_bytes()
+        )
+    ranged = [
+        request for request in local_site.requests
+        if request[0] == 'GET' and request[2] is not None
+    ]
+    assert len(ranged) == len(formats) * downloader.DOWNLOAD_SEGMENTS, (
+        'Большие архивы должны загружаться по частям'
+    )
+
+
+def pep_card_requests(local_site):
+    return [
+        request for request in local_site.requests
+        if request[1].startswith('/peps/pep-')
+    ]
+
+
+def test_pep_api_source(local_site, tempfile_session):
+    html_results = main.pep(tempfile_session, Namespace(source='html'))
+    tempfile_session.cache.clear()
+    local_site.requests.clear()
+    api_results = main.pep(tempfile_session, Namespace(source='api'))
+    assert api_results == html_results, (
+        'Источник `api` должен давать те же результаты, что и карточки PEP'
+    )
+    assert not pep_card_requests(local_site), (
+        'При источнике `api` карточки PEP не должны загружаться'
+    )
+
+
+def test_pep_api_verify_sample(local_site, tempfile_session):
+    main.pep(tempfile_session, Namespace(source='api', verify_sample=2))
+    assert len(pep_card_requests(local_site)) == 2
+
+
+def test_pep_api_fallback(local_site, tempfile_session):
+    (local_site.root / 'peps' / 'api' / 'peps.json').unlink()
+    got = main.pep(tempfile_session, Namespace(source='api'))
+    assert got[-1] == ('Total', 6)
+    assert len(pep_card_requests(local_site)) == 6
+
+
+def test_pep_mismatch_report(caplog, local_site, tempfile_session):
+    with caplog.at_level(logging.INFO):
+        main.pep(tempfile_session, Namespace(workers=4))
+    reports = [
+        record.getMessage() for record in caplog.records
+        if 'Несовпадающие статусы' in record.getMessage()
+    ]
+    assert len(reports) == 1, (
+        'Несовпадающие статусы должны выводиться одним отчётом в конце'
+    )
+    assert reports[0].startswith('Несовпадающие статусы: 1\nPEP ')
+
+
+@pytest.mark.parametrize('mode', ['whats-new', 'latest-versions', 'pep'])
+def test_mode_rows_stream_results(local_site, tempfile_session, mode):
+    rows = main.MODE_TO_ROWS[mode](tempfile_session, Namespace(workers=2))
+    assert not isinstance(rows, list)
+    assert list(rows) == main.MODE_TO_FUNCTION[mode](
+        tempfile_session, Namespace(workers=2)
+    )
+
+
+def test_all_modes(monkeypatch, capsys, local_site, tempfile_session):
+    import outputs
+    monkeypatch.setattr(outputs, 'BASE_DIR', local_site.root.parent)
+    cli_args = Namespace(mode='all', output=['pretty', 'file'], workers=2)
+    assert main.all_modes(tempfile_session, cli_args) is None
+    assert cli_args.mode == 'all'
+    results_dir = local_site.root.parent / 'results'
+    for mode in ('whats-new', 'latest-versions', 'pep'):
+        assert len(list(results_dir.glob(f'{mode}_*.csv'))) == 1, (
+            f'Режим `all` должен сохранить результаты режима `{mode}`'
+        )
+    assert (
+        local_site.root.parent / 'downloads' / 'python-3.12-docs-pdf-a4.zip'
+    ).exists()
+    captured_out, _ = capsys.readouterr()
+    assert captured_out.count('Количество') == 1
+    assert captured_out.count('| Ссылка на документацию') == 1
+
+
+def test_all_modes_survives_failing_mode(monkeypatch, local_site,
+                                         tempfile_session):
+    def broken_mode(session, cli_args=None):
+        raise RuntimeError('сломанный режим')
+
+    monkeypatch.setitem(main.MODE_TO_FUNCTION, 'latest-versions', broken_mode)
+    import outputs
+    monkeypatch.setattr(outputs, 'BASE_DIR', local_site.root.parent)
+    with pytest.raises(main.ModeFailedException, match='latest-versions'):
+        main.all_modes(
+            tempfile_session, Namespace(output=['file'], workers=2)
+        )
+    assert list((local_site.root.parent / 'results').glob('pep_*.csv'))
@@ -0,0 +1,76 @@
+import re
+from argparse import Namespace
+
+import pytest
+
+import metrics
+import stats
+import transport
+from src import main
+
+SAMPLE = re.compile(
+    r'^(?P<name>[a-z0-9_]+)\{mode="(?P<mode>[a-z-]+)"'
+    r'(,run="(?P<run>[a-z-]+)")?\} (?P<value>\S+)$'
+)
+
+
+def parse_textfile(text):
+    samples = {}
+    for line in text.splitlines():
+        if line.startswith('#'):
+            assert re.match(r'^# (HELP|TYPE) bs4_parser_[a-z0-9_]+ ', line)
+            continue
+        match = SAMPLE.match(line)
+        assert match, f'Строка не в формате Prometheus: {line}'
+        key = match['name'], match['mode']
+        if match['run'] is not None:
+            key += (match['run'],)
+        samples[key] = float(match['value'])
+    return samples
+
+
+@pytest.fixture
+def clean_metrics():
+    stats.reset()
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_pep_run_metrics(clean_metrics, local_site, tempfile_session,
+                         tmp_path):
+    session = transport.mount_transport(
+        tempfile_session, Namespace(workers=2)
+    )
+    main.pep(session, Namespace(workers=2))
+    metrics.observe_duration('pep', 1.5)
+    path = metrics.write_textfile(tmp_path / 'textfile', 'pep')
+    assert path.name == 'bs4_parser_pep.prom'
+    assert [file.name for file in path.parent.iterdir()] == [path.name]
+    samples = parse_textfile(path.read_text(encoding='utf-8'))
+    assert samples['bs4_parser_requests', 'pep'] == 7
+    assert samples['bs4_parser_response_bytes', 'pep'] > 0
+    assert samples['bs4_parser_pages_parsed', 'pep'] == 6
+    assert samples['bs4_parser_pep_status_mismatches', 'pep'] == 1
+    assert samples['bs4_parser_cache_hit_ratio', 'pep'] == 0
+    assert samples['bs4_parser_run_duration_seconds', 'pep', 'pep'] == 1.5
+
+    stats.reset()
+    main.pep(session, Namespace(workers=2))
+    samples = parse_textfile(metrics.render('pep'))
+    assert samples['bs4_parser_requests', 'pep'] == 0
+    assert samples['bs4_parser_cache_hit_ratio', 'pep'] == 1
+
+
+def test_all_modes_durations(clean_metrics, monkeypatch, local_site,
+                             tempfile_session):
+    import outputs
+    monkeypatch.setattr(outputs, 'BASE_DIR', local_site.root.parent)
+    main.all_modes(tempfile_session, Namespace(output=['file'], workers=2))
+    samples = parse_textfile(metrics.render('all'))
+    for mode in main.MODE_TO_FUNCTION:
+        assert samples['bs4_parser_run_duration_seconds', mode, 'all'] > 0
+    assert not any(len(key) == 2 and key[1] != 'all' for key in samples), (
+        'Метрики запуска `all` не должны совпадать с рядами '
+        'отдельных запусков режимов'
+    )
@@ -1,3 +1,6 @@
+import json
+import sqlite3
+from contextlib import closing
 from datetime import datetime
 from typing import Optional
 from pathlib import Path
@@ -90,3 +93,166 @@ def test_output_file():
     assert hasattr(outputs, 'file_output'), (
         'Напишите функцию `file_output` в модуле `output.py`'
     )
+
+
+def test_stream_pretty_output(capsys, records):
+    rows = records('whats-new')
+    outputs.control_output(iter(rows), cli_args('whats-new', 'pretty'))
+    captured_out, _ = capsys.readouterr()
+    lines = captured_out.splitlines()
+    assert '------' in lines[0]
+    assert lines[0] == lines[2] == lines[-1]
+    assert len({len(line) for line in lines}) == 1, (
+        'Все строки потоковой таблицы должны быть одной ширины'
+    )
+    assert len(lines) > len(rows) + 3, (
+        'Длинные значения должны переноситься на следующие строки'
+    )
+    columns = [''] * len(rows[0])
+    for line in lines[1:2] + lines[3:-1]:
+        for index, part in enumerate(line[2:-2].split(' | ')):
+            columns[index] += ''.join(part.split())
+    for row in rows:
+        for column, cell in zip(columns, row):
+            assert ''.join(str(cell).split()) in column
+
+
+def test_stream_output_empty(capsys, monkeypatch, tmp_path):
+    monkeypatch.setattr(outputs, 'BASE_DIR', Path(tmp_path))
+    for output_format in (None, 'pretty', 'file'):
+        outputs.control_output(iter([]), cli_args('pep', output_format))
+    captured_out, _ = capsys.readouterr()
+    assert captured_out == ''
+    assert not list(Path(tmp_path).iterdir())
+
+
+def test_stream_file_output_keeps_partial_results(monkeypatch, tmp_path):
+    monkeypatch.setattr(outputs, 'BASE_DIR', Path(tmp_path))
+
+    def interrupted_rows():
+        yield ('Статус', 'Количество')
+        yield ('Active', 2)
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        outputs.control_output(interrupted_rows(), cli_args('pep', 'file'))
+    output_file, = Path(tmp_path).glob('results/*.csv')
+    assert output_file.read_text(encoding='utf-8').splitlines() == [
+        '"Статус","Количество"', '"Active","2"'
+    ]
+
+
+def test_jsonl_output(monkeypatch, tmp_path, records):
+    monkeypatch.setattr(outputs, 'BASE_DIR', Path(tmp_path))
+    rows = records('pep')
+    outputs.control_output(iter(rows), cli_args('pep', 'jsonl'))
+    output_file, = Path(tmp_path).glob('results/pep_*.jsonl')
+    lines = output_file.read_text(encoding='utf-8').splitlines()
+    assert [json.loads(line) for line in lines] == [
+        dict(zip(rows[0], row)) for row in rows[1:]
+    ]
+
+
+def test_sqlite_output_history(monkeypatch, tmp_path, records):
+    monkeypatch.setattr(outputs, 'BASE_DIR', Path(tmp_path))
+    rows = records('pep')
+    for _ in range(2):
+        outputs.control_output(rows, cli_args('pep', 'sqlite'))
+    outputs.control_output(
+        records('whats-new'), cli_args('whats-new', 'sqlite')
+    )
+    db_path = Path(tmp_path) / 'results' / 'history.sqlite3'
+    with closing(sqlite3.connect(db_path)) as connection:
+        runs = connection.execute(
+            'SELECT run_at, COUNT(*) FROM results WHERE mode = ? '
+            'GROUP BY run_at ORDER BY run_at', ('pep',)
+        ).fetchall()
+        assert [count for _, count in runs] == [len(rows) - 1] * 2
+        stored = connection.execute(
+            'SELECT row FROM results WHERE mode = ? AND run_at = ? '
+            'ORDER BY position', ('pep', runs[-1][0])
+        ).fetchall()
+        plan = ' '.join(
+            str(step) for step in connection.execute(
+                'EXPLAIN QUERY PLAN SELECT row FROM results '
+                'WHERE mode = ? AND run_at = ?', ('pep', runs[-1][0])
+            )
+        )
+    assert [json.loads(row) for row, in stored] == [
+        dict(zip(rows[0], row)) for row in rows[1:]
+    ]
+    assert 'PRIMARY KEY' in plan, (
+        'Выборка по режиму и времени запуска должна использовать индекс'
+    )
+
+
+def test_sqlite_history_status_index(monkeypatch, tmp_path):
+    monkeypatch.setattr(outputs, 'BASE_DIR', Path(tmp_path))
+    rows = [
+        ('Статус', 'Количество'), ('Active', 36), ('Final', 271),
+        ('Draft', 27), ('Withdrawn', 57), ('Total', 391),
+    ]
+    for _ in range(3):
+        outputs.control_output(rows, cli_args('pep', 'sqlite'))
+    db_path = Path(tmp_path) / 'results' / 'history.sqlite3'
+    query = (
+        "SELECT run_at, json_extract(row, '$.Количество') FROM results "
+        "WHERE mode = ? AND json_extract(row, '$.Статус') = ?"
+    )
+    with closing(sqlite3.connect(db_path)) as connection:
+        trend = connection.execute(query, ('pep', 'Active')).fetchall()
+        plan = ' '.join(
+            str(step) for step in connection.execute(
+                f'EXPLAIN QUERY PLAN {query}', ('pep', 'Active')
+            )
+        )
+    assert [count for _, count in trend] == [36] * 3
+    assert 'results_status' in plan, (
+        'Выборка по статусу должна использовать индекс results_status'
+    )
+
+
+def test_control_output_fan_out(capsys, monkeypatch, tmp_path, records):
+    monkeypatch.setattr(outputs, 'BASE_DIR', Path(tmp_path))
+    rows = records('pep')
+    produced = []
+
+    def mode_rows():
+        for row in rows:
+            produced.append(row)
+            yield row
+
+    cli_arg = Namespace(
+        mode='pep', output=['pretty', 'file', 'jsonl', 'sqlite', 'file']
+    )
+    outputs.control_output(mode_rows(), cli_arg)
+    assert produced == rows, 'Строки должны быть получены один раз'
+    captured_out, _ = capsys.readouterr()
+    assert '------' in captured_out and 'Active' in captured_out
+    output_file, = Path(tmp_path).glob('results/pep_*.csv')
+    assert len(output_file.read_text(encoding='utf-8').splitlines()) == (
+        len(rows)
+    )
+    assert len(list(Path(tmp_path).glob('results/pep_*.jsonl'))) == 1
+    assert (Path(tmp_path) / 'results' / 'history.sqlite3').exists()
+
+
+def test_sqlite_output_rolls_back_interrupted_run(monkeypatch, tmp_path):
+    monkeypatch.setattr(outputs, 'BASE_DIR', Path(tmp_path))
+
+    def interrupted_rows():
+        yield ('Статус', 'Количество')
+        yield ('Active', 2)
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        outputs.control_output(
+            interrupted_rows(), cli_args('pep', ['file', 'sqlite'])
+        )
+    output_file, = Path(tmp_path).glob('results/*.csv')
+    assert len(output_file.read_text(encoding='utf-8').splitlines()) == 2
+    db_path = Path(tmp_path) / 'results' / 'history.sqlite3'
+    with closing(sqlite3.connect(db_path)) as connection:
+        assert connection.execute(
+            'SELECT COUNT(*) FROM results'
+        ).fetchone() == (0,)
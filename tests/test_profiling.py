@@ -0,0 +1,60 @@
+import json
+import pstats
+from argparse import Namespace
+
+import pytest
+
+import profiling
+import stats
+from src import main
+
+
+@pytest.fixture
+def profiled():
+    stats.reset()
+    profiling.reset()
+    yield
+    profiling.disable()
+    profiling.reset()
+
+
+def test_phase_is_noop_when_disabled(profiled):
+    with profiling.phase('get_response', 'https://peps.python.org/'):
+        pass
+    assert profiling.report('pep', 0)['phases'] == {}
+
+
+def test_percentile():
+    values = [0.1 * number for number in range(1, 11)]
+    assert profiling.percentile(values, 50) == values[4]
+    assert profiling.percentile(values, 90) == values[8]
+    assert profiling.percentile(values, 99) == values[9]
+    assert profiling.percentile([1.0], 50) == 1.0
+
+
+@pytest.mark.parametrize('parser', ['lxml', 'bs4'])
+def test_profile_run_report(capsys, profiled, local_site, tempfile_session,
+                            tmp_path, parser):
+    cprofile_path = tmp_path / 'pep.prof'
+    cli_args = Namespace(
+        mode='pep', output=None, workers=2, parser=parser,
+        profile=True, cprofile=cprofile_path,
+    )
+    duration = main.profile_run(tempfile_session, cli_args)
+    assert 'Total 6' in capsys.readouterr().out
+    report_path, = (tmp_path / 'profiles').glob('pep_*.json')
+    report = json.loads(report_path.read_text(encoding='utf-8'))
+    parse_phases = (
+        ('lxml_parse',) if parser == 'lxml' else ('make_soup', 'find_tag')
+    )
+    for phase in ('get_response', *parse_phases, 'output:ConsoleSink'):
+        summary = report['phases'][phase]
+        assert summary['count'] > 0
+        assert summary['p50'] <= summary['p90'] <= summary['p99'] <= (
+            summary['max']
+        )
+    assert report['phases']['get_response']['count'] == 7
+    assert report['duration'] == duration
+    assert report['cache'] == {'hits': 0, 'misses': 7, 'revalidated': 0}
+    assert len(report['slowest_urls']) == 7
+    assert pstats.Stats(str(cprofile_path)).total_calls > 0
@@ -0,0 +1,287 @@
+import gzip
+import threading
+import time
+from argparse import Namespace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+import requests_mock
+
+import downloader
+import stats
+import transport
+from src import utils
+
+URL = 'https://peps.python.org/flaky/'
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(transport.time, 'sleep', lambda seconds: None)
+    stats.reset()
+
+
+def test_transport_retries_transient_errors(no_backoff):
+    session = transport.mount_transport(
+        requests.Session(), Namespace(workers=16, timeout=3, retries=2)
+    )
+    with requests_mock.Mocker() as mock:
+        mock.get(URL, [
+            {'status_code': 503},
+            {'exc': requests.ConnectTimeout},
+            {'text': 'ok', 'status_code': 200},
+        ])
+        got = utils.get_response(session, URL)
+        assert got.text == 'ok'
+        assert mock.call_count == 3
+        assert mock.request_history[0].timeout == (
+            transport.CONNECT_TIMEOUT, 3
+        )
+    assert stats.get('request_retries') == 2
+    assert stats.get('request_failures') == 0
+    adapter = session.get_adapter(URL)
+    assert adapter._pool_maxsize == 16
+
+
+def test_transport_gives_up_after_retries(no_backoff):
+    session = transport.mount_transport(
+        requests.Session(), Namespace(workers=2, timeout=3, retries=1)
+    )
+    with requests_mock.Mocker() as mock:
+        mock.get(URL, status_code=503)
+        mock.post(URL, status_code=503)
+        assert utils.get_response(session, URL) is None
+        assert mock.call_count == 2
+        with pytest.raises(requests.HTTPError):
+            transport.send(session, 'POST', URL)
+        assert mock.call_count == 3
+    assert stats.get('request_retries') == 1
+    assert stats.get('request_failures') == 2
+
+
+def test_backoff_time_is_bounded():
+    session_transport = transport.Transport(
+        backoff_factor=1, max_backoff=4
+    )
+    for attempt in range(6):
+        assert 0 <= session_transport.backoff_time(attempt) <= min(
+            4, 2 ** attempt
+        )
+
+
+def test_parse_retry_after():
+    assert transport.parse_retry_after('3') == 3
+    assert transport.parse_retry_after(None) is None
+    assert transport.parse_retry_after('soon') is None
+    assert transport.parse_retry_after(
+        'Wed, 21 Oct 2015 07:28:00 GMT'
+    ) == 0
+
+
+def test_host_limiter_aimd():
+    limiter = transport.HostLimiter(rate=0, max_concurrency=8)
+    assert limiter.limit == transport.INITIAL_CONCURRENCY
+    for _ in range(20):
+        limiter.acquire()
+        limiter.release(0.1)
+    ramped_up = limiter.limit
+    assert transport.INITIAL_CONCURRENCY < ramped_up <= 8
+    limiter.acquire()
+    limiter.release(1.0)
+    assert limiter.limit == ramped_up, (
+        'Лимит не должен расти при медленных ответах'
+    )
+    limiter.acquire()
+    limiter.release(0.1, congested=True)
+    assert limiter.limit == ramped_up * transport.CONCURRENCY_DECREASE
+
+
+def test_host_limiter_blocks_concurrency_and_retry_after():
+    limiter = transport.HostLimiter(rate=0, max_concurrency=1)
+    limiter.acquire()
+    acquired = threading.Event()
+    waiter = threading.Thread(
+        target=lambda: (limiter.acquire(), acquired.set())
+    )
+    waiter.start()
+    assert not acquired.wait(0.2)
+    limiter.release(0.1, congested=True, retry_after=0.3)
+    started = time.monotonic()
+    assert acquired.wait(2)
+    assert time.monotonic() - started >= 0.25
+    waiter.join()
+
+
+class ThrottlingHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.hits += 1
+        if self.server.hits == 1:
+            self.send_response(429)
+            self.send_header('Retry-After', '1')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = b'ok'
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def test_limited_session_honors_retry_after(no_backoff):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ThrottlingHandler)
+    server.hits = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f'http://127.0.0.1:{server.server_port}/pep-0008/'
+    session = transport.mount_transport(
+        requests.Session(), Namespace(workers=4, timeout=3, retries=2)
+    )
+    try:
+        started = time.monotonic()
+        got = utils.get_response(session, url)
+        elapsed = time.monotonic() - started
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert got.text == 'ok'
+    assert server.hits == 2
+    assert elapsed >= 0.9, 'Повтор должен ждать время из `Retry-After`'
+    assert session.transport.concurrency() == {
+        f'127.0.0.1:{server.server_port}': 2.0
+    }
+
+
+class BodyHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header('Content-Length', str(300 * 1024))
+        self.end_headers()
+
+    def do_GET(self):
+        body = b'x' * 64 * 1024
+        self.send_response(200)
+        if self.path == '/gzip':
+            body = gzip.compress(body)
+            self.send_header('Content-Encoding', 'gzip')
+        if self.path == '/chunked':
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for start in range(0, len(body), 4096):
+                self.wfile.write(b'1000\r\n' + body[start:start + 4096])
+                self.wfile.write(b'\r\n')
+            self.wfile.write(b'0\r\n\r\n')
+            return
+        if self.path == '/bad-length':
+            self.send_header('Content-Length', 'unknown')
+            self.send_header('Connection', 'close')
+            self.close_connection = True
+        else:
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def body_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), BodyHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}/'
+    server.shutdown()
+    server.server_close()
+
+
+def test_limiter_slot_held_until_body_read(body_server):
+    session = transport.mount_transport(
+        requests.Session(), Namespace(workers=4)
+    )
+    adapter = session.get_adapter(body_server)
+    limiter = adapter.limiter(body_server, stream=True)
+    response = session.get(body_server, stream=True)
+    assert limiter.active == 1, (
+        'Место в лимите хоста должно быть занято, пока тело не прочитано'
+    )
+    assert len(response.content) == 64 * 1024
+    assert limiter.active == 0
+    with session.get(body_server, stream=True):
+        assert limiter.active == 1
+    assert limiter.active == 0, 'Закрытие ответа должно освобождать место'
+    session.get(body_server)
+    assert adapter.limiter(body_server).active == 0
+
+
+@pytest.mark.parametrize('method, path, expected', [
+    ('GET', '', 64 * 1024),
+    ('HEAD', '', 0),
+    ('GET', 'chunked', 64 * 1024),
+    ('GET', 'bad-length', 64 * 1024),
+    ('GET', 'gzip', len(gzip.compress(b'x' * 64 * 1024))),
+])
+def test_http_bytes_counts_body(body_server, method, path, expected):
+    stats.reset()
+    session = transport.mount_transport(
+        requests.Session(), Namespace(workers=4)
+    )
+    response = transport.send(session, method, body_server + path)
+    assert response.ok
+    assert stats.get('http_bytes') == expected, (
+        'Байты ответа должны считаться по телу, полученному из сети'
+    )
+
+
+class SegmentHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    body = bytes(range(256)) * 256
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        start, end = map(int, self.headers['Range'][6:].split('-'))
+        with self.server.lock:
+            self.server.active += 1
+            self.server.peak = max(self.server.peak, self.server.active)
+        time.sleep(0.2)
+        self.send_response(206)
+        self.send_header(
+            'Content-Range', f'bytes {start}-{end}/{len(self.body)}'
+        )
+        self.send_header('Content-Length', str(end - start + 1))
+        self.end_headers()
+        self.wfile.write(self.body[start:end + 1])
+        with self.server.lock:
+            self.server.active -= 1
+
+
+def test_download_segments_overlap(tmp_path):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), SegmentHandler)
+    server.lock = threading.Lock()
+    server.active = server.peak = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f'http://127.0.0.1:{server.server_port}/python-docs.zip'
+    session = transport.mount_transport(
+        requests.Session(), Namespace(workers=8)
+    )
+    path = tmp_path / 'python-docs.zip'
+    try:
+        downloader.download_segments(
+            session, url, path, len(SegmentHandler.body), 8
+        )
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert path.read_bytes() == SegmentHandler.body
+    assert server.peak == 8, (
+        'Части файла должны скачиваться одновременно'
+    )
@@ -1,3 +1,6 @@
+import threading
+import time
+
 import pytest
 import requests
 import requests_mock
@@ -54,3 +57,105 @@ def test_get_response(mock_session):
             'делает запрос к странице и возвращает ответ. \n'
             'Кстати: You are breathtaken!'
         )
+
+
+def test_fetch_all_async_uses_session_cache(local_site, tempfile_session):
+    urls = [local_site.doc_url, local_site.pep_url]
+    list(utils.fetch_all(tempfile_session, urls, workers=2))
+    got = list(
+        utils.fetch_all(tempfile_session, urls, workers=2, engine='async')
+    )
+    assert [response.url for response in got] == urls
+    assert all(response.from_cache for response in got), (
+        'Асинхронная загрузка должна использовать кеш сессии'
+    )
+
+
+@pytest.mark.parametrize('engine', ['threads', 'async'])
+@pytest.mark.parametrize('workers', [3, 16])
+def test_fetch_all_concurrency(monkeypatch, engine, workers):
+    lock = threading.Lock()
+    active = []
+    peak = []
+
+    def slow_response(session, url):
+        with lock:
+            active.append(url)
+            peak.append(len(active))
+        time.sleep(0.05)
+        with lock:
+            active.remove(url)
+        return url
+
+    monkeypatch.setattr(utils, 'get_response', slow_response)
+    urls = [f'{MAIN_DOC_URL}{number}/' for number in range(workers * 2)]
+    got = list(utils.fetch_all(None, urls, workers=workers, engine=engine))
+    assert got == urls
+    assert max(peak) == workers, (
+        f'Способ загрузки `{engine}` должен выполнять '
+        f'до {workers} запросов одновременно'
+    )
+
+
+@pytest.mark.parametrize('engine', ['threads', 'async'])
+def test_fetch_all_yields_before_all_complete(monkeypatch, engine):
+    finished = []
+
+    def slow_response(session, url):
+        if not url.endswith('0/'):
+            time.sleep(0.3)
+        finished.append(url)
+        return url
+
+    monkeypatch.setattr(utils, 'get_response', slow_response)
+    urls = [f'{MAIN_DOC_URL}{number}/' for number in range(4)]
+    responses = utils.fetch_all(None, urls, workers=4, engine=engine)
+    assert next(responses) == urls[0]
+    assert finished == urls[:1], (
+        f'Способ загрузки `{engine}` должен выдавать ответы '
+        'до завершения всех загрузок'
+    )
+    assert list(responses) == urls[1:]
+
+
+@pytest.mark.parametrize('target, page, tag, attrs', [
+    ('whats-new', 'docs/3/whatsnew/3.12.html', 'dl', None),
+    ('whats-new', 'docs/3/whatsnew/3.12.html', 'h1', None),
+    (
+        'pep', 'peps/pep-0001/index.html', 'dl',
+        {'class': 'field-list'},
+    ),
+])
+def test_make_soup_parse_targets(target, page, tag, attrs):
+    from conftest import SITE_DIR
+    text = (SITE_DIR / page).read_text(encoding='utf-8')
+    full = bs4.BeautifulSoup(text, features='lxml')
+    partial = utils.make_soup(text, target)
+    assert len(str(partial)) < len(str(full))
+    assert utils.find_tag(partial, tag, attrs).text == (
+        utils.find_tag(full, tag, attrs).text
+    ), 'Частичный разбор страницы должен находить те же теги'
+
+
+def test_get_response_revalidation_stats(local_site):
+    import stats
+    from requests_cache import CachedSession
+    session = CachedSession(backend='memory', always_revalidate=True)
+    page = local_site.root / 'docs' / '3' / 'whatsnew' / '3.12.html'
+    url = local_site.doc_url + 'whatsnew/3.12.html'
+    stats.reset()
+    utils.get_response(session, url)
+    assert stats.get('pages_refetched') == 1
+
+    got = utils.get_response(session, url)
+    assert got.revalidated
+    assert stats.get('pages_unchanged') == 1
+
+    page.write_text(page.read_text(encoding='utf-8') + '\n', encoding='utf-8')
+    got = utils.get_response(session, url)
+    assert not got.from_cache
+    assert stats.snapshot() == {
+        'pages_refetched': 2,
+        'pages_revalidated': 2,
+        'pages_unchanged': 1,
+    }